@@ -0,0 +1,100 @@
+"""
+Run a GameApp with an asyncio event loop instead of root.mainloop().
+
+The asyncio loop owns scheduling: Tk events are processed by a task that
+pumps the Tk event queue without waiting, and the game's animation timer
+is scheduled on the asyncio loop with deadlines measured by the loop's
+monotonic clock.  Other tasks, such as network players, telemetry writers,
+or bots, can run in the same loop as the game, without threads.
+
+Usage:
+    root = tk.Tk()
+    app = GorillaGame(root, ...)
+    aioloop.run(root, app)
+"""
+import asyncio
+import tkinter as tk
+import _tkinter
+
+# Seconds between checks of the Tk event queue
+TK_POLL_INTERVAL = 0.005
+
+
+class AsyncioScheduler:
+    """Schedule a GameApp's callbacks on an asyncio event loop.
+
+    When a callback schedules another callback (as animate() does for each
+    frame), the delay is measured from the deadline of the running callback
+    instead of the time it actually ran, so frames don't drift later
+    because of the time spent drawing each frame.  If the game falls
+    behind by more than one frame it skips ahead instead of running
+    frames back-to-back to catch up.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        self.loop = loop or asyncio.get_event_loop()
+        # deadline of the callback being run, or None
+        self._deadline = None
+
+    def call_later(self, delay, callback) -> asyncio.TimerHandle:
+        """Call callback after delay milliseconds. Returns a TimerHandle."""
+        now = self.loop.time()
+        start = now if self._deadline is None else self._deadline
+        deadline = start + delay/1000
+        if deadline < now:
+            # too late, don't try to catch up
+            deadline = now
+        return self.loop.call_at(deadline, self._run, deadline, callback)
+
+    def cancel(self, timer_handle):
+        timer_handle.cancel()
+
+    def _run(self, deadline, callback):
+        self._deadline = deadline
+        try:
+            callback()
+        finally:
+            self._deadline = None
+
+
+async def pump_tk(root: tk.Tk, interval=TK_POLL_INTERVAL):
+    """Process Tk events until the root window is destroyed."""
+    interpreter = root.tk
+    while True:
+        # process all pending events, without waiting for new events
+        while interpreter.dooneevent(_tkinter.ALL_EVENTS | _tkinter.DONT_WAIT):
+            pass
+        try:
+            if not root.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        await asyncio.sleep(interval)
+
+
+async def run_app(root: tk.Tk, app, *tasks):
+    """Run a GameApp in the current asyncio loop until its window is closed.
+    tasks are other coroutines to run in the same loop; they are
+    cancelled when the window is closed.
+    """
+    app.set_scheduler(AsyncioScheduler(asyncio.get_running_loop()))
+    closed = asyncio.Event()
+
+    def on_close():
+        closed.set()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    others = [asyncio.create_task(task) for task in tasks]
+    pump = asyncio.create_task(pump_tk(root))
+    window_closed = asyncio.create_task(closed.wait())
+    try:
+        await asyncio.wait([pump, window_closed], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in [pump, window_closed] + others:
+            task.cancel()
+
+
+def run(root: tk.Tk, app, *tasks):
+    """Run a GameApp using asyncio instead of root.mainloop()."""
+    asyncio.run(run_app(root, app, *tasks))
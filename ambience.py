@@ -0,0 +1,51 @@
+"""
+Window lights that switch on and off, and a sky that changes from night
+to day and back again.
+
+Windows are not changed one at a time.  Each window has a tag for a group
+of windows (see Building.light_group), and switching a group is one
+itemconfigure of that tag.  Changing the sky is one change of the canvas
+background and one itemconfigure of all craters, using the CRATER tag.
+So the cost of an update is the same for one building or fifty.
+"""
+import math
+import random
+from building import Building, LIGHT_GROUPS, LIGHT_WINDOW, DARK_WINDOW, PROB_LIGHT_ON
+from explosion import CRATER
+import game_constants as config
+
+# Colors of the sky from night to midday.  The night sky is the usual
+# canvas color.  These are distinct from the gorilla and banana images.
+SKY_COLORS = [config.CANVAS_COLOR, "medium blue", "royal blue", "steel blue", "sky blue"]
+
+
+class Ambience:
+    """The time of day, which determines the color of the sky,
+    and random switching of groups of window lights.
+
+    Arguments:
+        day_length - number of updates in a day, from night to night
+    """
+
+    def __init__(self, day_length=config.DAY_LENGTH):
+        self.day_length = day_length
+        self.time = 0
+        self.sky = SKY_COLORS[0]
+
+    def daylight(self) -> float:
+        """Amount of daylight, from 0 at midnight to 1 at midday."""
+        return (1 - math.cos(2*math.pi*self.time/self.day_length))/2
+
+    def update(self, canvas):
+        """Advance the time of day by one update, and switch one
+        group of lights on or off.  Lights are more likely to be on at night.
+        """
+        self.time = (self.time + 1) % self.day_length
+        sky = SKY_COLORS[round(self.daylight()*(len(SKY_COLORS) - 1))]
+        if sky != self.sky:
+            self.sky = sky
+            canvas['bg'] = sky
+            canvas.itemconfigure(CRATER, fill=sky, outline=sky)
+        group = Building.light_group(random.random() < 0.5, random.randrange(LIGHT_GROUPS))
+        lights_on = random.random() < PROB_LIGHT_ON*(1 - 0.8*self.daylight())
+        canvas.itemconfigure(group, fill=LIGHT_WINDOW if lights_on else DARK_WINDOW)
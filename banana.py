@@ -2,7 +2,8 @@ import tkinter as tk
 import math
 from PIL import Image
 from gamelib import Sprite
-from game_constants import CANVAS_WIDTH, CANVAS_HEIGHT, GRAVITY, MAX_BANANA_SPEED
+from masks import CollisionMask
+from game_constants import GRAVITY, MAX_BANANA_SPEED
 
 
 class Banana(Sprite):
@@ -23,11 +24,53 @@ class Banana(Sprite):
         # initial speed and angle of a throw
         self.angle = 45
         self.speed = 20
-        # create images for a spinning banana, by rotating existing image
-        image = Image.open(image_filename)
-        self.images = [image]
-        for angle in range(45, 360, 45):
-            self.images.append(image.rotate(angle))
+        # images for a spinning banana are the same for every banana
+        self.images = Banana.spin_images(image_filename)
+        self.masks = Banana.image_masks(image_filename)
+        # a banana that leaves the sides or bottom of the canvas stops
+        self.canvas_size = (int(canvas['width']), int(canvas['height']))
+
+    # rotated images of each banana image file, shared by all bananas
+    _rotated_images = {}
+    # collision masks of the rotated images, shared by all bananas
+    _masks = {}
+
+    @classmethod
+    def rotated_images(cls, image_filename):
+        """Return images for a spinning banana, by rotating an existing image.
+        The images are created once and shared by all bananas.
+        """
+        if image_filename not in cls._rotated_images:
+            image = Image.open(image_filename)
+            images = [image]
+            for angle in range(45, 360, 45):
+                images.append(image.rotate(angle))
+            cls._rotated_images[image_filename] = images
+        return cls._rotated_images[image_filename]
+
+    @staticmethod
+    def spin_images(image_filename):
+        """Return a PhotoImage for each image of a spinning banana,
+        shared by all bananas (including bananas of volleys).
+        """
+        return Sprite.shared_images(("spin", image_filename),
+                                    lambda: Banana.rotated_images(image_filename))
+
+    @classmethod
+    def image_masks(cls, image_filename):
+        """Return a CollisionMask for each image of a spinning banana."""
+        if image_filename not in cls._masks:
+            cls._masks[image_filename] = [CollisionMask(image)
+                                          for image in cls.rotated_images(image_filename)]
+        return cls._masks[image_filename]
+
+    def mask_origin(self):
+        """Position of the top left corner of the image, which is
+        centered on (x,y), as ints for testing collision masks.
+        The size of the mask is used, since the size of the image is a Tk call.
+        """
+        mask = self.masks[self.image_index]
+        return (math.floor(self.x) - mask.width//2, math.floor(self.y) - mask.height//2)
 
     def init_element(self):
         self.vx = 0
@@ -96,12 +139,12 @@ class Banana(Sprite):
             # choose next image
             self.image_index = (self.image_index 
                                 - self.x_axis) % len(self.images)
-            # paste function provided by ImageTk.PhotoImage class,
-            # but it is "very slow" according to docs
-            # pasted image must be same size as original image
-            self.image.paste(self.images[self.image_index])
+            # show the next image, instead of pasting it into our PhotoImage
+            # (paste is "very slow" according to the docs)
+            self.show_image(self.images[self.image_index])
 
-            if self.y > CANVAS_HEIGHT or not (0 <= self.x <= CANVAS_WIDTH):
+            (width, height) = self.canvas_size
+            if self.y > height or not (0 <= self.x <= width):
                 self.stop()
                 self.hide()
 
@@ -116,6 +159,9 @@ class Banana(Sprite):
         """Throw the banana, using the initial speed and angle."""
         self.show()
         self.is_moving = True
+        # always spin from the first image, so throws are repeatable
+        self.image_index = 0
+        self.show_image(self.images[0])
         angle = math.radians(self._angle)
         self.vx = math.cos(angle)*self._speed*self.x_axis
         self.vy = math.sin(angle)*self._speed
@@ -124,10 +170,18 @@ class Banana(Sprite):
         self.is_moving = False
     
     def hits(self, element) -> bool:
-        """Test if the banana hits a game element."""
+        """Test if the banana hits a game element.
+        Elements that have collision masks, such as a Monkey, are hit
+        if a solid pixel of the banana touches a solid pixel of the element.
+        """
         if not self.is_moving:
             # a hit can occur only _after_ the banana is thrown
             return False
+        if getattr(element, "masks", None):
+            (left, top) = element.mask_origin()
+            (x, y) = self.mask_origin()
+            return element.masks[element.image_index].overlaps(
+                        self.masks[self.image_index], x - left, y - top)
         x = self.x
         y = self.y
         # use actual image bounds or tighten to min as done here?
@@ -0,0 +1,83 @@
+"""
+Several games in one window, such as a tournament view or a kiosk.
+
+All the boards use one FrameScheduler, so one Tk timer animates every
+board, and the boards share images, collision masks and bot worker
+processes, so each board costs little more than its canvas items.
+Click a board to send the keys to it.
+
+Usage:
+    python3 boards.py [--bots] [boards] [columns]
+"""
+import argparse
+import os
+import tkinter as tk
+from tkinter import ttk
+from gamelib import FrameScheduler
+from gorilla_game import GorillaGame
+from telemetry import open_telemetry
+from results import open_results
+from latency import open_tracer
+from broadcast import open_broadcaster
+import game_constants as config
+
+
+def board_filename(filename, board):
+    """Name of the file of one board, such as "events-3.bin" for
+    "events.bin", or None if filename is None.
+    """
+    if not filename:
+        return filename
+    (name, extension) = os.path.splitext(filename)
+    return f"{name}-{board}{extension}"
+
+
+def create_boards(root, count, columns, width, height, controllers=config.PLAYER_CONTROLLERS):
+    """Create count games in a grid with columns games in each row.
+    Returns the games and the FrameScheduler that runs them.
+
+    The boards share one results database and latency tracer.  Each board
+    writes telemetry to its own file (see board_filename), and board k
+    broadcasts on BROADCAST_PORT + k, or on any free port if it is 0.
+    """
+    scheduler = FrameScheduler(root, config.BOARD_TICK, config.BOARD_BUDGET)
+    results = open_results(config.RESULTS_DB)
+    latency = open_tracer(config.LATENCY_TRACE, root)
+    games = []
+    for k in range(count):
+        # each game has its own frame, which gets the keys when it has focus
+        cell = ttk.Frame(root, padding=2)
+        cell.grid(row=k//columns, column=k % columns)
+        port = config.BROADCAST_PORT
+        broadcast = open_broadcaster(port + k if port else port)
+        if port is not None:
+            print(f"Board {k}: spectators can watch on port {broadcast.port}")
+        game = GorillaGame(cell, width, height, config.UPDATE_DELAY,
+                           scheduler=scheduler, controllers=controllers,
+                           telemetry=open_telemetry(board_filename(config.TELEMETRY_FILE, k)),
+                           results=results, latency=latency, broadcast=broadcast)
+        game.canvas.bind("<Button-1>", lambda event, cell=cell: cell.focus_set(), add="+")
+        games.append(game)
+    return (games, scheduler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play several Gorilla games in one window.")
+    parser.add_argument("--bots", action="store_true",
+                        help="all players are bots, and new games start by themselves")
+    parser.add_argument("boards", type=int, nargs="?", default=4)
+    parser.add_argument("columns", type=int, nargs="?", default=None)
+    args = parser.parse_args()
+    columns = args.columns or max(1, round(args.boards**0.5))
+    rows = (args.boards + columns - 1)//columns
+
+    root = tk.Tk()
+    root.title("Gorilla Games")
+    root.resizable(False, False)
+    # shrink the boards to fit on the screen, leaving room for the control panels
+    scale = min(1, root.winfo_screenwidth()/(columns*config.CANVAS_WIDTH),
+                0.8*root.winfo_screenheight()/(rows*(config.CANVAS_HEIGHT + 80)))
+    controllers = ("bot", "bot") if args.bots else config.PLAYER_CONTROLLERS
+    create_boards(root, args.boards, columns, int(scale*config.CANVAS_WIDTH),
+                  int(scale*config.CANVAS_HEIGHT), controllers)
+    root.mainloop()
@@ -0,0 +1,426 @@
+"""
+Broadcast a live game to spectators over a loopback TCP socket.
+
+At the start of each game the host sends a keyframe, the complete
+GameState as JSON.  After that, each animation frame is sent as a small
+binary delta of what changed: the turn, the bananas (including their
+velocity and the angle and speed being aimed), the gorillas'
+throwing images, the explosion, the scores, and new craters.
+
+A background thread fans the messages out to every subscriber.  Each
+subscriber has a limited amount of unsent data.  A subscriber that falls
+further behind has its unsent deltas dropped, and when it catches up it
+is sent a new keyframe of the current state, instead of the host keeping
+an unlimited backlog for it.
+
+Messages are a 4-byte little-endian length followed by the message.
+A keyframe starts with b"K" and a delta starts with b"D".
+
+Run this file to watch a game being broadcast on a port:
+
+    python3 broadcast.py 5555
+"""
+import json
+import selectors
+import socket
+import struct
+import threading
+from collections import deque
+from state import GameState, ExplosionState
+
+# Maximum unsent data (bytes) for each subscriber before it is skipped
+# to the next keyframe
+MAX_PENDING = 64*1024
+LENGTH = struct.Struct("<I")
+DELTA_HEADER = struct.Struct("<cIB")
+# Parts of a delta, in the order they are sent, and their formats
+TURN = 1             # player_index, phase
+BANANAS = 2          # x, y, vx, vy, speed, angle, image_index, is_moving of each banana
+GORILLAS = 4         # image_index, is_throwing of each gorilla
+EXPLOSION = 8        # x, y, step, target
+NO_EXPLOSION = 16    # the explosion is over (no data)
+SCORES = 32          # score of each player
+CRATERS = 64         # number of new craters, then x, y, radius of each
+TURN_FORMAT = struct.Struct("<BB")
+BANANAS_FORMAT = struct.Struct("<ffffffB?ffffffB?")
+GORILLAS_FORMAT = struct.Struct("<B?B?")
+EXPLOSION_FORMAT = struct.Struct("<ffBb")
+SCORES_FORMAT = struct.Struct("<HH")
+CRATER_COUNT = struct.Struct("<B")
+CRATER_FORMAT = struct.Struct("<fff")
+
+
+def bananas(state):
+    return tuple(value for player in state.players
+                 for value in (player.banana.x, player.banana.y,
+                               player.banana.vx, player.banana.vy,
+                               player.banana.speed, player.banana.angle,
+                               player.banana.image_index, player.banana.is_moving))
+
+
+def gorillas(state):
+    return tuple(value for player in state.players
+                 for value in (player.image_index, player.is_throwing))
+
+
+def explosion(state):
+    e = state.explosion
+    return (e.x, e.y, e.step, e.target) if e else None
+
+
+def encode_keyframe(state: GameState, tick: int) -> bytes:
+    data = state.to_dict()
+    data["tick"] = tick
+    return b"K" + json.dumps(data, separators=(",", ":")).encode()
+
+
+def encode_delta(previous: GameState, state: GameState, tick: int) -> bytes:
+    """Return a delta with the changes from previous to state,
+    or None if nothing changed.
+    """
+    mask = 0
+    parts = []
+    if (state.player_index, state.phase) != (previous.player_index, previous.phase):
+        mask |= TURN
+        parts.append(TURN_FORMAT.pack(state.player_index, state.phase))
+    values = bananas(state)
+    if values != bananas(previous):
+        mask |= BANANAS
+        parts.append(BANANAS_FORMAT.pack(*values))
+    values = gorillas(state)
+    if values != gorillas(previous):
+        mask |= GORILLAS
+        parts.append(GORILLAS_FORMAT.pack(*values))
+    values = explosion(state)
+    if values != explosion(previous):
+        if values:
+            mask |= EXPLOSION
+            parts.append(EXPLOSION_FORMAT.pack(*values))
+        else:
+            mask |= NO_EXPLOSION
+    if state.scores != previous.scores:
+        mask |= SCORES
+        parts.append(SCORES_FORMAT.pack(*state.scores))
+    new_craters = state.craters[len(previous.craters):]
+    if new_craters:
+        mask |= CRATERS
+        parts.append(CRATER_COUNT.pack(len(new_craters)//3))
+        parts.append(new_craters.tobytes())
+    if not mask:
+        return None
+    return DELTA_HEADER.pack(b"D", tick, mask) + b"".join(parts)
+
+
+def apply_delta(state: GameState, message: bytes) -> int:
+    """Apply a delta to a GameState. Returns the tick of the delta."""
+    (_, tick, mask) = DELTA_HEADER.unpack_from(message, 0)
+    offset = DELTA_HEADER.size
+    if mask & TURN:
+        (state.player_index, state.phase) = TURN_FORMAT.unpack_from(message, offset)
+        offset += TURN_FORMAT.size
+    if mask & BANANAS:
+        values = BANANAS_FORMAT.unpack_from(message, offset)
+        offset += BANANAS_FORMAT.size
+        for k, player in enumerate(state.players):
+            banana = player.banana
+            (banana.x, banana.y, banana.vx, banana.vy, banana.speed, banana.angle,
+             banana.image_index, banana.is_moving) = values[8*k:8*k+8]
+    if mask & GORILLAS:
+        values = GORILLAS_FORMAT.unpack_from(message, offset)
+        offset += GORILLAS_FORMAT.size
+        for k, player in enumerate(state.players):
+            (player.image_index, player.is_throwing) = values[2*k:2*k+2]
+    if mask & EXPLOSION:
+        (x, y, step, target) = EXPLOSION_FORMAT.unpack_from(message, offset)
+        offset += EXPLOSION_FORMAT.size
+        state.explosion = ExplosionState(x, y, target)
+        state.explosion.step = step
+    if mask & NO_EXPLOSION:
+        state.explosion = None
+    if mask & SCORES:
+        state.scores = list(SCORES_FORMAT.unpack_from(message, offset))
+        offset += SCORES_FORMAT.size
+    if mask & CRATERS:
+        (count,) = CRATER_COUNT.unpack_from(message, offset)
+        offset += CRATER_COUNT.size
+        state.craters.frombytes(message[offset:offset + count*CRATER_FORMAT.size])
+    return tick
+
+
+class Subscriber:
+    """A connection to a spectator, and the messages not sent yet."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.messages = deque()
+        self.pending = 0
+        # bytes of the first message already sent
+        self.sent = 0
+        # True if deltas were dropped, so the next message must be a keyframe
+        self.skipped = False
+
+    def add(self, message: bytes):
+        self.messages.append(message)
+        self.pending += len(message)
+
+    def skip(self):
+        """Drop unsent messages, except a message that is partly sent."""
+        while len(self.messages) > (1 if self.sent else 0):
+            self.pending -= len(self.messages.pop())
+        self.skipped = True
+
+
+class Broadcaster:
+    """Send a game to subscribers that connect to a port on localhost.
+
+    keyframe() and tick() are called by the game, and never wait for
+    the network.  A background thread accepts connections and sends data.
+    """
+
+    def __init__(self, port=0, max_pending=MAX_PENDING):
+        self.max_pending = max_pending
+        self._server = socket.create_server(("127.0.0.1", port))
+        self._server.setblocking(False)
+        self.port = self._server.getsockname()[1]
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        # the game thread wakes the sending thread using this socket pair
+        (self._wakeup, self._wakeup_receiver) = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._wakeup_receiver.setblocking(False)
+        self._selector.register(self._wakeup_receiver, selectors.EVENT_READ)
+        self._lock = threading.Lock()
+        self._subscribers = []
+        # messages from the game, not given to subscribers yet
+        self._outbox = []
+        self._state = None
+        self._tick = 0
+        self._keyframe = None
+        self._closed = False
+        self.skipped = 0
+        self._thread = threading.Thread(target=self._run, name="broadcast", daemon=True)
+        self._thread.start()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def keyframe(self, state: GameState):
+        """Send the complete state, at the start of a game."""
+        with self._lock:
+            self._tick += 1
+            self._state = state
+            self._keyframe = encode_keyframe(state, self._tick)
+            self._outbox.append(self._keyframe)
+        self._wake()
+
+    def tick(self, state: GameState):
+        """Send the changes since the last state that was sent.
+        state must not be changed after it is passed to tick or keyframe.
+        """
+        if self._state is None or state.skyline is not self._state.skyline \
+                or len(state.craters) < len(self._state.craters):
+            self.keyframe(state)
+            return
+        with self._lock:
+            self._tick += 1
+            message = encode_delta(self._state, state, self._tick)
+            self._state = state
+            self._keyframe = None
+            if not message:
+                return
+            self._outbox.append(message)
+        self._wake()
+
+    def close(self):
+        self._closed = True
+        self._wake()
+        self._thread.join()
+
+    def _wake(self):
+        try:
+            self._wakeup.send(b"\0")
+        except BlockingIOError:
+            # the thread has not read earlier wakeups yet, so it will run
+            pass
+
+    def _current_keyframe(self) -> bytes:
+        """A keyframe of the last state sent. Must hold the lock."""
+        if self._keyframe is None:
+            self._keyframe = encode_keyframe(self._state, self._tick)
+        return self._keyframe
+
+    def _run(self):
+        while not self._closed:
+            for (key, events) in self._selector.select(timeout=1.0):
+                if key.fileobj is self._server:
+                    self._accept()
+                elif key.fileobj is self._wakeup_receiver:
+                    try:
+                        self._wakeup_receiver.recv(4096)
+                    except BlockingIOError:
+                        pass
+                else:
+                    self._send(key.data)
+            self._distribute()
+        for subscriber in self._subscribers:
+            subscriber.connection.close()
+        self._server.close()
+
+    def _accept(self):
+        try:
+            (connection, _) = self._server.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(False)
+        subscriber = Subscriber(connection)
+        with self._lock:
+            if self._state is not None:
+                subscriber.add(self._frame(self._current_keyframe()))
+            self._subscribers.append(subscriber)
+        self._selector.register(connection, selectors.EVENT_WRITE, subscriber)
+
+    @staticmethod
+    def _frame(message: bytes) -> bytes:
+        return LENGTH.pack(len(message)) + message
+
+    def _distribute(self):
+        """Give new messages to each subscriber, skipping subscribers
+        that are too far behind.
+        """
+        with self._lock:
+            messages = [self._frame(message) for message in self._outbox]
+            self._outbox.clear()
+            for subscriber in self._subscribers:
+                for message in messages:
+                    if message[LENGTH.size:LENGTH.size + 1] == b"K":
+                        # a keyframe replaces anything not sent yet
+                        subscriber.skip()
+                        subscriber.skipped = False
+                    elif subscriber.skipped:
+                        continue
+                    elif subscriber.pending + len(message) > self.max_pending:
+                        subscriber.skip()
+                        self.skipped += 1
+                        continue
+                    subscriber.add(message)
+                if subscriber.skipped and not subscriber.messages:
+                    # caught up, so continue from a keyframe of the current state
+                    subscriber.add(self._frame(self._current_keyframe()))
+                    subscriber.skipped = False
+                events = selectors.EVENT_WRITE if subscriber.messages else selectors.EVENT_READ
+                self._selector.modify(subscriber.connection, events, subscriber)
+
+    def _send(self, subscriber: Subscriber):
+        """Send as much as possible to a subscriber without waiting."""
+        while subscriber.messages:
+            message = subscriber.messages[0]
+            try:
+                count = subscriber.connection.send(message[subscriber.sent:])
+            except BlockingIOError:
+                return
+            except OSError:
+                self._remove(subscriber)
+                return
+            subscriber.sent += count
+            if subscriber.sent < len(message):
+                return
+            subscriber.messages.popleft()
+            subscriber.pending -= len(message)
+            subscriber.sent = 0
+        # nothing left to send, so check for a closed connection
+        # (spectators don't send anything, so other data is ignored)
+        try:
+            if subscriber.connection.recv(4096) == b"":
+                self._remove(subscriber)
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._remove(subscriber)
+
+    def _remove(self, subscriber):
+        self._selector.unregister(subscriber.connection)
+        subscriber.connection.close()
+        with self._lock:
+            self._subscribers.remove(subscriber)
+
+
+class NullBroadcaster:
+    """A Broadcaster without a socket or subscribers."""
+    subscribers = 0
+
+    def keyframe(self, state):
+        pass
+
+    def tick(self, state):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_broadcaster(port):
+    """Return a Broadcaster on port, or a NullBroadcaster if port is None."""
+    if port is None:
+        return NullBroadcaster()
+    return Broadcaster(port)
+
+
+class Spectator:
+    """Receive a broadcast game.  self.state is the GameState of the game,
+    after the messages received so far.
+    """
+
+    def __init__(self, port, host="127.0.0.1"):
+        self.connection = socket.create_connection((host, port))
+        self.state = None
+        self.tick = 0
+        self._buffer = b""
+
+    def close(self):
+        self.connection.close()
+
+    def receive(self):
+        """Wait for the next message and apply it to self.state.
+        Returns "keyframe", "delta", or None if the broadcast ended.
+        """
+        message = self._read_message()
+        if message is None:
+            return None
+        if message[:1] == b"K":
+            data = json.loads(message[1:])
+            self.tick = data.pop("tick")
+            self.state = GameState.from_dict(data)
+            return "keyframe"
+        self.tick = apply_delta(self.state, message)
+        return "delta"
+
+    def _read_message(self):
+        while True:
+            if len(self._buffer) >= LENGTH.size:
+                (length,) = LENGTH.unpack_from(self._buffer)
+                end = LENGTH.size + length
+                if len(self._buffer) >= end:
+                    message = self._buffer[LENGTH.size:end]
+                    self._buffer = self._buffer[end:]
+                    return message
+            data = self.connection.recv(65536)
+            if not data:
+                return None
+            self._buffer += data
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 2:
+        print("Usage: python3 broadcast.py port")
+        sys.exit(1)
+    spectator = Spectator(int(sys.argv[1]))
+    turn = None
+    while (kind := spectator.receive()):
+        state = spectator.state
+        if kind == "keyframe":
+            print(f"Game: scores {state.scores[0]} - {state.scores[1]}")
+        elif state.player_index != turn:
+            print(f"Gorilla {state.player_index + 1}'s turn")
+        turn = state.player_index
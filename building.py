@@ -1,11 +1,21 @@
 from gamelib import GameCanvasElement
 import tkinter as tk
-from random import random, randint
+import time
+from random import random, randint, randrange
+import game_constants as config
 
 # Probability lights are on in a room in a building
 PROB_LIGHT_ON = 0.7
 LIGHT_WINDOW = "yellow2"
 DARK_WINDOW = "gray35"
+# A tag used to identify windows on the canvas.  Each window is also tagged
+# with one of LIGHT_GROUPS groups of windows that are lit (or dark) when
+# the building is drawn, so a group can be switched on or off at once.
+WINDOW = "window"
+LIGHT_GROUPS = 8
+# A tag used to identify all parts of buildings, so the skyline
+# can be replaced without touching other canvas items
+SKYLINE = "skyline"
 # Min and Max building height, as a fraction of the canvas height
 BLDG_MIN_HEIGHT = 0.2
 BLDG_MAX_HEIGHT = 0.7
@@ -20,27 +30,46 @@ ROOM_WIDTH = 2*WIN_WIDTH
 # Must be wide enough for gorilla to stand on.
 MIN_ROOMS = 5
 MAX_ROOMS = 8
+# Maximum number of layouts to try when looking for a fair layout
+MAX_LAYOUT_ATTEMPTS = 20
 
 
 class BuildingFactory:
     """Factory for buildings, of course."""
 
     @classmethod
-    def create_buildings(cls, canvas):
+    def create_buildings(cls, canvas, layout=None):
         """Create buildings that fill the width of a canvas. Heights of 
         buildings are randomly chosen not to exceed about 70% of canvas height.
         This method uses canvas['width'] and canvas['height'] to get the canvas size,
         since winfo_width() and winfo_height() don't return the correct sizes
         of the canvas if it hasn't been drawn yet.
 
+        Arguments:
+            layout - list of (x, width, height, color) of buildings to create,
+                     as returned by random_layout(), or None for a random layout
+
         Returns:  list of Building objects
         """
         canvas_width = int(canvas['width'])
         canvas_height = int(canvas['height'])
         baseline = canvas_height
+        if layout is None:
+            layout = cls.random_layout(canvas_width, canvas_height)
+        return [Building(canvas, x, baseline, width, height, color)
+                for (x, width, height, color) in layout]
+
+    @classmethod
+    def random_layout(cls, canvas_width, canvas_height):
+        """Choose random sizes and colors of buildings that fill the width
+        of a canvas, without creating the buildings.
+
+        Returns:  list of (x, width, height, color) of each building
+        """
         min_bldg_width = MIN_ROOMS*ROOM_WIDTH
         x = 0
-        buildings = []
+        layout = []
+        color = None
         while x < canvas_width:
             width = ROOM_WIDTH*randint(MIN_ROOMS,MAX_ROOMS) + randint(0, WIN_WIDTH)
             # fill the width of canvas with complete buildings
@@ -52,24 +81,99 @@ class BuildingFactory:
             height = int( canvas_height * ( BLDG_MIN_HEIGHT 
                             + random()*(BLDG_MAX_HEIGHT-BLDG_MIN_HEIGHT) )
                         )
-            color = BuildingFactory.choose_color(buildings)
-            bldg = Building(canvas, x, baseline, width, height, color)
+            color = BuildingFactory.choose_color(color)
+            layout.append((x, width, height, color))
             x = x + width
-            buildings.append(bldg)
+        return layout
+
+    @classmethod
+    def choose_player_buildings(cls, num_buildings):
+        """Randomly choose a building for each player to stand on, such that
+        player 0 is on left and player 1 is on right.
+
+        Returns:  tuple of the indices of the buildings for players 0 and 1
+        """
+        center_building = num_buildings//2
+        left = randint(0, min(2, center_building-1))
+        # player 1 count buildings from right edge
+        right = num_buildings - 1 - randint(0, min(2, center_building-1))
+        return (left, right)
+
+    @classmethod
+    def create_layout(cls, canvas_width, canvas_height,
+                      threshold=config.FAIRNESS_THRESHOLD,
+                      time_limit=config.LAYOUT_TIME_LIMIT):
+        """Choose a random layout of buildings and the buildings the players
+        stand on.  If threshold > 0, layouts are regenerated (up to
+        MAX_LAYOUT_ATTEMPTS times) until the fairness of the layout
+        (see fairness.py) is at least threshold.  Layouts are not checked
+        for more than time_limit milliseconds (if not None), so the game
+        doesn't stop responding; after that the fairest layout is used.
+
+        Returns:  tuple of (layout, player_buildings)
+        """
+        # avoid circular imports
+        import fairness
+        from state import Skyline
+        best = None
+        deadline = time.perf_counter() + time_limit/1000 if time_limit is not None else None
+        for _ in range(MAX_LAYOUT_ATTEMPTS):
+            layout = cls.random_layout(canvas_width, canvas_height)
+            player_buildings = cls.choose_player_buildings(len(layout))
+            if threshold <= 0 or not fairness.HAS_NUMPY:
+                return (layout, player_buildings)
+            skyline = Skyline(canvas_height,
+                              [(x, w, h, BLDG_COLORS.index(color)) for (x, w, h, color) in layout])
+            started = time.perf_counter()
+            score = fairness.layout_fairness(skyline, player_buildings,
+                                             canvas_width, canvas_height)
+            checked = time.perf_counter()
+            if score >= threshold:
+                return (layout, player_buildings)
+            if best is None or score > best[0]:
+                best = (score, layout, player_buildings)
+            # stop if another check would end after the deadline
+            if deadline is not None and 2*checked - started > deadline:
+                break
+        # no layout was fair enough in time, so use the fairest one
+        return best[1:]
+
+    @classmethod
+    def create_buildings_for_skyline(cls, canvas, skyline):
+        """Create buildings having the sizes, colors and lights of a
+        state.Skyline, such as one saved in a game snapshot.
+
+        Returns:  list of Building objects
+        """
+        buildings = []
+        for k, (x, width, height, color) in enumerate(skyline.buildings()):
+            lights = skyline.lights[k] if k < len(skyline.lights) else None
+            buildings.append(Building(canvas, x, skyline.baseline, width, height,
+                                      BLDG_COLORS[color], lights))
         return buildings
 
     @classmethod
-    def choose_color(cls, buildings):
+    def create_buildings_from_library(cls, canvas, library, index=None):
+        """Create the buildings of a layout in a skyline_library.SkylineLibrary.
+        If index is None, a layout is chosen randomly.
+
+        Returns:  tuple of (list of Building objects, player_buildings)
+        """
+        if index is None:
+            (skyline, player_buildings) = library.random_layout()
+        else:
+            (skyline, player_buildings, _) = library.layout(index)
+        return (cls.create_buildings_for_skyline(canvas, skyline), player_buildings)
+
+    @classmethod
+    def choose_color(cls, previous_color=None):
         """Choose a random color for the next building to draw,
         but avoid too many consecutive buildings of same color.
         """
-        n = len(buildings) - 1
         color = BLDG_COLORS[randint(0, len(BLDG_COLORS) - 1)]
-        # testing: use all colors sequentially
-        #color = bldg_colors[n % len(bldg_colors)]
-        if n >= 0 and color == buildings[n].color:
+        if color == previous_color:
             # Boring. Too many buildings of same color.
-            return BuildingFactory.choose_color(buildings)
+            return BuildingFactory.choose_color(previous_color)
         return color
 
 
@@ -78,7 +182,7 @@ class Building(GameCanvasElement):
     It has a width, height, color, and some randomly lit windows.
     """
 
-    def __init__(self, canvas, x, y, width, height, color):
+    def __init__(self, canvas, x, y, width, height, color, lights=None):
         """Initialize a new building.
         Arguments:
             x - the left edge of the building
@@ -86,10 +190,15 @@ class Building(GameCanvasElement):
             width - the building width
             height - the building height
             color - color of the building
+            lights - bit mask of lit windows, counting from top left,
+                     or None to randomly choose lit windows
         """
         self.width = width
         self.height = height
         self.color = color
+        self.lights = lights
+        # (x, y, color) of each window, so the building can be redrawn later
+        self.windows = []
         super().__init__(canvas, x, y)
         # called by GameCanvasElement onstructor
         #self.canvas_object_id = self.init_canvas_object()
@@ -104,17 +213,41 @@ class Building(GameCanvasElement):
         xright = self.x + self.width
         ytop = self.y - self.height # coordinate system increases downward
 
-        object_id = self.canvas.create_rectangle(self.x, self.y, xright, ytop, fill=self.color)
+        object_id = self.canvas.create_rectangle(self.x, self.y, xright, ytop,
+                                                 fill=self.color, tags=SKYLINE)
         self.make_windows(self.x, ytop)
         # return the object id
         return object_id
 
-    def make_windows(self, xleft, ytop):
-        """Draw windows in the building."""
+    @staticmethod
+    def floors_and_rooms(width, height):
+        """Return the number of floors and the number of rooms per floor
+        (each room has one window) of a building of a given size.
+        """
         # How many floors can we fit only building?
-        nfloors = self.height//FLOOR_HEIGHT
+        nfloors = height//FLOOR_HEIGHT
         # How many rooms per floor? (horizontal)
-        nrooms = (self.width - WIN_WIDTH//2)//ROOM_WIDTH
+        nrooms = (width - WIN_WIDTH//2)//ROOM_WIDTH
+        return (nfloors, nrooms)
+
+    @staticmethod
+    def random_lights(width, height, rng=None):
+        """Randomly choose lit windows for a building of a given size.
+        rng is a random.Random to use, for repeatable choices.
+
+        Returns:  bit mask of lit windows, counting from top left
+        """
+        choose = rng.random if rng else random
+        (nfloors, nrooms) = Building.floors_and_rooms(width, height)
+        mask = 0
+        for k in range(nfloors*nrooms):
+            if choose() < PROB_LIGHT_ON:
+                mask |= 1 << k
+        return mask
+
+    def make_windows(self, xleft, ytop):
+        """Draw windows in the building."""
+        (nfloors, nrooms) = Building.floors_and_rooms(self.width, self.height)
         # In the original QBasic Gorilla game, the windows are aligned
         # starting from top of building, with excess space at the bottom
         for row in range(0,nfloors):
@@ -124,14 +257,35 @@ class Building(GameCanvasElement):
             for col in range(0, nrooms):
                 x = xleft + WIN_WIDTH + col*ROOM_WIDTH 
                 # randomly choose lights on (LIGHT_WINDOW) or off (DARK_WINDOW)
-                color = LIGHT_WINDOW if random() < PROB_LIGHT_ON else DARK_WINDOW
-                # draw the window
-                self.canvas.create_rectangle(
+                if self.lights is None:
+                    is_lit = random() < PROB_LIGHT_ON
+                else:
+                    is_lit = self.lights >> len(self.windows) & 1
+                color = LIGHT_WINDOW if is_lit else DARK_WINDOW
+                self.windows.append((x, y, color))
+                # draw the window. Windows are only changed using tags,
+                # so they are created using buffered commands.
+                self.canvas.create("rectangle",
                         x, y, 
                         x+WIN_WIDTH, y+WIN_HEIGHT, 
-                        fill=color
+                        fill=color,
+                        tags=(SKYLINE, WINDOW,
+                              Building.light_group(is_lit, randrange(LIGHT_GROUPS)))
                         )
 
+    @staticmethod
+    def light_group(is_lit, group):
+        """Tag of a group of windows that are lit (or not) when drawn."""
+        return f"{'lit' if is_lit else 'dark'}-windows-{group}"
+
+    def light_mask(self) -> int:
+        """Return a bit mask of the lit windows, counting from top left."""
+        mask = 0
+        for k, (_, _, color) in enumerate(self.windows):
+            if color == LIGHT_WINDOW:
+                mask |= 1 << k
+        return mask
+
     def contains(self, x, y):
         return self.x < x < (self.x + self.width) and self.y-self.height < y < self.y
 
@@ -0,0 +1,286 @@
+"""
+Controllers choose the throws of a player: a human using the keyboard
+and control panel, a bot, a scripted replay, or a remote player.
+
+The decision of a controller that is not human may take a long time,
+so it runs in a worker thread or process, and the (angle, speed) it
+chooses is put in a queue.  The game checks the queue using a timer,
+so the game keeps animating and responding while a player is thinking.
+A decision that takes longer than a timeout is abandoned.
+"""
+import json
+import math
+import queue
+import random
+import socket
+import threading
+import time
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from state import GameState, THROWING, EXPLODING
+import game_constants as config
+
+
+class Controller(ABC):
+    """Chooses the angle and speed of each throw by a player.
+
+    executor is "thread" or "process" for a decision that should run
+    in a worker thread or process, or None for a quick decision that
+    can be made by the game's thread.
+    name identifies the player in match results and ratings, such as
+    "bot" or the address of a remote player, or is None if the game
+    should ask the player's name.
+    """
+    is_human = False
+    executor = "thread"
+    name = None
+
+    @abstractmethod
+    def decide(self, state: GameState, player_index: int):
+        """Return (angle, speed) of the next throw by player_index."""
+
+
+class HumanController(Controller):
+    """A player using the keyboard or control panel."""
+    is_human = True
+    executor = None
+
+    def __init__(self, name=None):
+        self.name = name
+
+    def decide(self, state, player_index):
+        """No automatic decision: the player throws using the keys."""
+        return None
+
+
+class BotController(Controller):
+    """A computer player that simulates throws and chooses the throw that
+    lands nearest the other player, with some error in the speed.
+    """
+    executor = "process"
+    name = "bot"
+    ANGLES = range(15, 90, 5)
+    SPEEDS = range(10, config.MAX_BANANA_SPEED + 1, 3)
+
+    def __init__(self, speed_error=2):
+        self.speed_error = speed_error
+
+    def decide(self, state, player_index):
+        target = state.players[1 - player_index]
+        best = None
+        for angle in self.ANGLES:
+            for speed in self.SPEEDS:
+                miss = self.miss_distance(state, player_index, angle, speed, target)
+                if best is None or miss < best[0]:
+                    best = (miss, angle, speed)
+        (_, angle, speed) = best
+        speed += random.randint(-self.speed_error, self.speed_error)
+        return (angle, min(max(speed, 1), config.MAX_BANANA_SPEED))
+
+    @staticmethod
+    def miss_distance(state, player_index, angle, speed, target) -> float:
+        """Distance from the other player to where a throw lands."""
+        game = state.clone()
+        game.player_index = player_index
+        game.throw(angle, speed)
+        while game.phase == THROWING and game.player_index == player_index:
+            game.step()
+        if game.phase == EXPLODING:
+            if game.explosion.target == player_index:
+                return math.inf
+            if game.explosion.target >= 0:
+                return 0.0
+            (x, y) = (game.explosion.x, game.explosion.y)
+        else:
+            # left the canvas
+            banana = game.players[player_index].banana
+            (x, y) = (banana.x, banana.y)
+        return math.hypot(x - target.x, y - target.y)
+
+
+class ReplayController(Controller):
+    """A player that makes a list of throws, such as the throws of one
+    player in a GameRecord.  After the last throw, it repeats its last throw.
+    """
+    executor = None
+    name = "replay"
+
+    def __init__(self, throws):
+        """throws is a list of (angle, speed)."""
+        self.throws = list(throws)
+        self.next = 0
+
+    def decide(self, state, player_index):
+        throw = self.throws[min(self.next, len(self.throws) - 1)]
+        self.next += 1
+        return throw
+
+
+class RemoteController(Controller):
+    """A player on another computer, connected using a TCP socket.
+
+    For each throw, a line of JSON is sent to the remote player:
+        {"id": request_id, "player": player_index, "state": GameState.to_dict()}
+    and the remote player replies with a line: request_id angle speed
+    Replies to earlier requests, which the game no longer waits for,
+    are skipped.  After an error, such as a timeout, the connection is
+    closed, and the next request connects again.
+    """
+
+    def __init__(self, host, port, timeout=config.DECISION_TIMEOUT):
+        self.address = (host, port)
+        self.name = f"{host}:{port}"
+        self.timeout = timeout
+        self.connection = None
+        self.reader = None
+        self.request_id = 0
+        # a decision that was abandoned by the game may still be running
+        self.lock = threading.Lock()
+
+    def decide(self, state, player_index):
+        with self.lock:
+            return self._decide(state, player_index)
+
+    def _decide(self, state, player_index):
+        try:
+            if self.connection is None:
+                self.connection = socket.create_connection(self.address, self.timeout)
+                self.reader = self.connection.makefile("r")
+            self.request_id += 1
+            request = {"id": self.request_id, "player": player_index,
+                       "state": state.to_dict()}
+            self.connection.sendall(json.dumps(request).encode() + b"\n")
+            while True:
+                reply = self.reader.readline()
+                if not reply:
+                    raise ConnectionError("remote player disconnected")
+                (reply_id, angle, speed) = reply.split()
+                if int(reply_id) == self.request_id:
+                    return (int(angle), int(speed))
+        except Exception:
+            self.disconnect()
+            raise
+
+    def disconnect(self):
+        """Close the connection, so the next request connects again."""
+        if self.connection is not None:
+            self.reader.close()
+            self.connection.close()
+        self.connection = None
+        self.reader = None
+
+
+def create_controller(name):
+    """Create a controller by name: "human", "human:player name", "bot",
+    or "host:port" for a remote player.
+    """
+    if name == "human":
+        return HumanController()
+    if name.startswith("human:"):
+        return HumanController(name[len("human:"):])
+    if name == "bot":
+        return BotController()
+    (host, port) = name.rsplit(":", 1)
+    return RemoteController(host, int(port))
+
+
+class Decisions:
+    """Run the decisions of controllers, and deliver the results
+    through a queue that is checked by the game's thread.
+    """
+
+    # worker threads and processes, shared by all games in a process
+    _executors = {}
+
+    def __init__(self, timeout=config.DECISION_TIMEOUT):
+        self.timeout = timeout
+        self.results = queue.Queue()
+        # requests that were not delivered: id -> (deadline, future or None)
+        self._pending = {}
+        self._next_id = 0
+
+    def request(self, controller, state, player_index) -> int:
+        """Ask a controller to decide on a throw. Returns a request id."""
+        self._next_id += 1
+        request_id = self._next_id
+        deadline = time.monotonic() + self.timeout
+        if controller.executor is None:
+            self._pending[request_id] = (deadline, None)
+            self._deliver(request_id, controller.decide, state, player_index)
+        else:
+            future = self._executor(controller.executor).submit(
+                    controller.decide, state, player_index)
+            self._pending[request_id] = (deadline, future)
+            future.add_done_callback(lambda future: self._done(request_id, future))
+        return request_id
+
+    def _done(self, request_id, future):
+        """Put the result of a worker in the queue. This is called
+        by the worker thread, or a thread that waits for a process.
+        """
+        if future.cancelled():
+            return
+        error = future.exception()
+        self.results.put((request_id, None if error else future.result(), error))
+
+    def _deliver(self, request_id, decide, *args):
+        try:
+            self.results.put((request_id, decide(*args), None))
+        except Exception as ex:
+            self.results.put((request_id, None, ex))
+
+    @classmethod
+    def _executor(cls, kind):
+        if kind not in cls._executors:
+            if kind == "thread":
+                cls._executors[kind] = ThreadPoolExecutor(max_workers=2)
+            else:
+                # one process per CPU, for several games with bots.
+                # don't fork a process that is running Tk
+                cls._executors[kind] = ProcessPoolExecutor(
+                        mp_context=multiprocessing.get_context("spawn"))
+        return cls._executors[kind]
+
+    def cancel(self):
+        """Ignore the results of all requests made so far."""
+        for request_id in list(self._pending):
+            self._abandon(request_id)
+
+    def _abandon(self, request_id):
+        """Forget a request, and don't start it if it is waiting for a worker.
+        A decision that has started can't be stopped, so it runs to the end.
+        """
+        (_, future) = self._pending.pop(request_id)
+        if future:
+            future.cancel()
+
+    def poll(self):
+        """Return a list of (request_id, (angle, speed), exception) of
+        decisions that are done, or timed out with a TimeoutError.
+        """
+        done = []
+        while True:
+            try:
+                (request_id, throw, error) = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if self._pending.pop(request_id, None) is not None:
+                done.append((request_id, throw, error))
+        now = time.monotonic()
+        for request_id, (deadline, _) in list(self._pending.items()):
+            if now > deadline:
+                self._abandon(request_id)
+                done.append((request_id, None, TimeoutError("took too long to decide")))
+        return done
+
+    def waiting(self) -> bool:
+        """Test if any request has not been delivered."""
+        return bool(self._pending)
+
+    @classmethod
+    def shutdown(cls):
+        """Stop the workers of all games, without waiting for decisions in progress."""
+        for executor in cls._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        cls._executors.clear()
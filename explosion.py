@@ -1,7 +1,13 @@
 import math
-from tkinter.constants import X
+import tkinter as tk
+from PIL import Image, ImageDraw, ImageTk
 from gamelib import GameCanvasElement
 
+# A tag (string) used to identify craters left by explosions on canvas
+CRATER = "crater"
+# A tag used to identify the pooled canvas items that show explosions
+EXPLOSION = "explosion"
+
 
 class Explosion(GameCanvasElement):
     """An explosion that destroys other objects as it expands,
@@ -20,12 +26,16 @@ class Explosion(GameCanvasElement):
               'sienna3','sienna4',
               'brown4','saddle brown']
 
-    def __init__(self, game_app, x=0, y=0):
-        """Create an explosion centered at x, y."""
+    def __init__(self, game_app, x=0, y=0, pool=None):
+        """Create an explosion centered at x, y.
+        The explosion is drawn using a canvas item from pool,
+        which is an ExplosionPool for the canvas.
+        """
         self.radius = Explosion.EXPANSION_RATE
         self.step = 0
         # object that was hit to cause explosion
         self.hits = None
+        self.pool = pool if pool else ExplosionPool(game_app)
         # super constructor will call-back to init_canvas_object
         super().__init__(game_app, x, y)
 
@@ -38,67 +48,64 @@ class Explosion(GameCanvasElement):
         return r <= self.radius
 
     def init_canvas_object(self):
-        r = self.radius
-        id = self.canvas.create_oval(self.x-r, self.y-r, self.x+r, self.y+r,
-                    fill=self.color_for_step(0)
-                    )
-        return id
+        return self.pool.acquire(self.x, self.y)
 
     def update(self):
         """Update explosion, expand or contract one step.
-        This uses the property:
-        width = width of border drawn around oval.  1/2 of border 
-           is inside the oval and 1/2 is drawn outside the oval.
+        Each step shows the next of the precomputed explosion images
+        on the pooled canvas item, so a step is only one canvas call.
         """
         self.step += 1
         if self.step < Explosion.STEPS:
-            # expand the explosion by increasing the size of the border
+            # expand the explosion
             self.radius += Explosion.EXPANSION_RATE
-            color = self.color_for_step(self.step)
-            self.canvas.itemconfigure(self.canvas_object_id,
-                    width=2*self.radius,  # width is 1/2 inside, 1/2 outside
-                    outline=color
-                    )
-            
+            self.pool.show_frame(self.canvas_object_id, self.step)
         elif self.step == Explosion.STEPS:
-            # When explosion reaches its maximum size, replace the
-            # explosion with a burned out fireball that contracts.
-            self.canvas.delete(self.canvas_object_id)
-            # Size of new oval in color of canvas background
-            self.radius = self.EXPANSION_RATE * Explosion.STEPS
-            r = self.radius
-            # First draw an oval having the color of canvas background
-            # and same size as the maximized explosion.
-            self.canvas.create_oval(
-                    self.x-r, self.y-r, self.x+r, self.y+r,
-                    fill=self.canvas['bg'],
-                    outline=self.canvas['bg'] 
-                    )
-            # Cover it with a burned out explosion.
-            color = self.color_for_step(self.step)
-            self.canvas_object_id = self.canvas.create_oval(
-                self.x-r, self.y-r, self.x+r, self.y+r,
-                fill=color
-                )
+            # When explosion reaches its maximum size, leave a hole
+            # having the color of canvas background, and show
+            # a burned out fireball on top of it that contracts.
+            self.radius = self.crater_radius()
+            self.pool.add_crater(self.x, self.y, self.radius)
+            self.pool.show_frame(self.canvas_object_id, self.step)
         elif self.step < 2*Explosion.STEPS:
             # Contract to nothing.
-            # Can be done by increase border width or scaling the image,
-            # but scaling the image works better and is simpler.
-            scale = 1 - (self.step - Explosion.STEPS)/Explosion.STEPS
-            self.canvas.scale(self.canvas_object_id,
-                    self.x,
-                    self.y,
-                    scale,
-                    scale
-                    )
+            self.pool.show_frame(self.canvas_object_id, self.step)
         elif self.step == 2*Explosion.STEPS:
-            # Last step. Remove the burned out explosion.
-            self.canvas.delete(self.canvas_object_id)
-            # remove it from GameApp so it won't be updated again
-            # Not necessary.
-            #self.app.remove_element(self)
+            # Last step. Return the canvas item to the pool.
+            self.pool.release(self.canvas_object_id)
+
+    def crater(self):
+        """Return the Crater left by this explosion."""
+        return Crater(self.x, self.y, self.crater_radius())
 
-    def color_for_step(self, step):
+    @classmethod
+    def crater_radius(cls):
+        """Radius of the hole left behind by an explosion."""
+        return cls.EXPANSION_RATE * cls.STEPS
+
+    @classmethod
+    def frame_sequence(cls):
+        """The (color, radius) of the fireball as drawn at each step
+        0 .. 2*STEPS-1, where radius is the visible radius in pixels.
+        This is the same sequence that update() draws on the canvas,
+        so it can be used to render explosions without a canvas.
+        """
+        frames = []
+        # while expanding, the outline is drawn centered on the edge of
+        # the initial oval, so the fireball extends beyond the oval
+        for step in range(cls.STEPS):
+            radius = cls.EXPANSION_RATE if step == 0 else \
+                     cls.EXPANSION_RATE*(step+2)
+            frames.append((cls.color_for_step(step), radius))
+        # while contracting, the burned out oval is scaled each step
+        radius = cls.crater_radius()
+        for step in range(cls.STEPS, 2*cls.STEPS):
+            radius *= 1 - (step - cls.STEPS)/cls.STEPS
+            frames.append((cls.color_for_step(step), radius))
+        return frames
+
+    @classmethod
+    def color_for_step(cls, step):
         """Color to use for explosion at a given step during expansion."""
 
         """
@@ -117,7 +124,7 @@ class Explosion(GameCanvasElement):
             return hexcolor[1:]
         return hexcolor
         """
-        return Explosion.COLORS[min(step,len(Explosion.COLORS)-1)]
+        return cls.COLORS[min(step,len(cls.COLORS)-1)]
 
     def render(self):
         """Rendering done in update, but this method is needed to override
@@ -139,3 +146,87 @@ class Explosion(GameCanvasElement):
     @property
     def height(self):
         return self.radius
+
+
+class Crater:
+    """A hole left by an explosion, that bananas can pass through."""
+    __slots__ = ("x", "y", "radius")
+
+    def __init__(self, x, y, radius):
+        self.x = x
+        self.y = y
+        self.radius = radius
+
+    def contains(self, x, y):
+        return math.hypot(x - self.x, y - self.y) <= self.radius
+
+
+class ExplosionPool:
+    """Canvas image items for drawing explosions, and the explosion
+    images shown at each step.
+
+    The images of the whole explosion are drawn once and shared by
+    all explosions.  An explosion borrows a canvas item from the pool
+    and returns it when done, so explosions don't create and delete
+    canvas items, except for the crater each explosion leaves behind.
+    """
+    # number of canvas items created when the pool is created
+    SIZE = 2
+    # PhotoImage for each step, shared by all pools (created when first needed)
+    _frames = None
+
+    def __init__(self, canvas, size=SIZE):
+        self.canvas = canvas
+        self.frames = ExplosionPool.frame_images(canvas)
+        self.free = [self._create_item() for _ in range(size)]
+
+    @classmethod
+    def frame_images(cls, canvas):
+        """Return a PhotoImage for each step of an explosion.
+        The images are centered on the explosion and transparent outside
+        the fireball.  They are drawn once, the first time they are needed.
+        """
+        if cls._frames is None:
+            cls._frames = []
+            for (color, radius) in Explosion.frame_sequence():
+                # winfo_rgb returns 16-bit values for the color
+                rgb = tuple(value >> 8 for value in canvas.winfo_rgb(color))
+                r = max(1, round(radius))
+                image = Image.new("RGBA", (2*r + 1, 2*r + 1), (0, 0, 0, 0))
+                ImageDraw.Draw(image).ellipse((0, 0, 2*r, 2*r), fill=rgb)
+                cls._frames.append(ImageTk.PhotoImage(image))
+        return cls._frames
+
+    def _create_item(self) -> int:
+        return self.canvas.create_image(0, 0, image=self.frames[0],
+                                        state=tk.HIDDEN, tags=EXPLOSION)
+
+    def acquire(self, x, y) -> int:
+        """Get a canvas item for a new explosion at (x,y),
+        showing the first step of the explosion.
+        """
+        item = self.free.pop() if self.free else self._create_item()
+        self.canvas.coords(item, x, y)
+        self.canvas.itemconfigure(item, image=self.frames[0], state=tk.NORMAL)
+        # show the explosion on top of everything else
+        self.canvas.tag_raise(item)
+        return item
+
+    def show_frame(self, item, step):
+        self.canvas.itemconfigure(item, image=self.frames[step])
+
+    def add_crater(self, x, y, r):
+        """Draw a hole with the color of canvas background, below the explosion."""
+        crater = self.canvas.create_oval(x-r, y-r, x+r, y+r,
+                    fill=self.canvas['bg'],
+                    outline=self.canvas['bg'],
+                    tags=CRATER
+                    )
+        # keep the explosions on top of the crater
+        self.canvas.tag_lower(crater, EXPLOSION)
+        return crater
+
+    def release(self, item):
+        """Hide an explosion's canvas item and return it to the pool."""
+        self.canvas.itemconfigure(item, state=tk.HIDDEN)
+        self.free.append(item)
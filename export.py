@@ -0,0 +1,225 @@
+"""
+Export a recorded game as an animated GIF or a sequence of PNG images,
+without opening a window.
+
+Frames are produced one at a time by a pipeline of generators:
+
+    ReplaySimulation.frames() -> render_frames() -> encoder -> file
+
+Only a few frames exist at any time, so a long game uses no more memory
+than a short one.  The skyline is drawn once as a background image,
+and each frame is a copy of the background with the sprites pasted on it.
+Encoding can be done by several worker threads (PNG and GIF encoders in
+pillow release the interpreter lock while compressing).
+
+Usage:
+    python3 export.py replays/game.json game.gif
+    python3 export.py --png frames/ replays/game.json
+"""
+import argparse
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from PIL import Image, ImageColor, ImageDraw
+from PIL import GifImagePlugin
+from building import WIN_WIDTH, WIN_HEIGHT
+from explosion import Explosion
+from replay import GameRecord, ReplaySimulation, \
+        BANANA_IMAGE, MONKEY_IMAGE, MONKEY_ARM_RAISED_IMAGE
+import game_constants as config
+
+# Tk color names used by the game that pillow doesn't know.
+# Values are from the X11 color database used by Tk.
+TK_COLORS = {
+    "yellow2": (238, 238, 0),
+    "gray35": (89, 89, 89),
+    "gray80": (204, 204, 204),
+    "firebrick3": (205, 38, 38),
+    "cyan3": (0, 205, 205),
+    "red2": (238, 0, 0),
+    "red3": (205, 0, 0),
+    "sienna3": (205, 104, 57),
+    "sienna4": (139, 71, 38),
+    "brown4": (139, 35, 35),
+}
+MESSAGE_COLOR = "white"
+# Maximum number of frames being encoded at one time by worker threads
+ENCODE_QUEUE_SIZE = 8
+
+
+def rgb(color: str):
+    """Return the (r,g,b) value of a Tk color name."""
+    if color in TK_COLORS:
+        return TK_COLORS[color]
+    # pillow knows most Tk names, but without spaces ("dark blue" = "darkblue")
+    return ImageColor.getrgb(color.replace(" ", ""))
+
+
+class Sprites:
+    """Images of gorillas and bananas used to render frames."""
+
+    def __init__(self):
+        banana = Image.open(BANANA_IMAGE).convert("RGBA")
+        self.bananas = [banana] + [banana.rotate(angle)
+                                   for angle in range(45, 360, 45)]
+        monkey = Image.open(MONKEY_IMAGE).convert("RGBA")
+        arm_raised = Image.open(MONKEY_ARM_RAISED_IMAGE).convert("RGBA")
+        # player 1 throws to the left, so throwing images are flipped
+        flipped = arm_raised.transpose(Image.FLIP_LEFT_RIGHT)
+        self.monkeys = [[monkey, arm_raised, arm_raised],
+                        [monkey, flipped, flipped]]
+
+
+def render_background(record: GameRecord) -> Image.Image:
+    """Draw the sky and buildings of a recorded game."""
+    image = Image.new("RGB", (record.width, record.height), rgb(record.background))
+    draw = ImageDraw.Draw(image)
+    for (x, y, width, height, color, windows) in record.buildings:
+        draw.rectangle((x, y - height, x + width, y), fill=rgb(color), outline="black")
+        for (wx, wy, wcolor) in windows:
+            draw.rectangle((wx, wy, wx + WIN_WIDTH, wy + WIN_HEIGHT),
+                           fill=rgb(wcolor), outline="black")
+    return image
+
+
+def render_frames(record: GameRecord, sprites: Sprites = None):
+    """Generate an RGB image for each frame of a recorded game.
+
+    The background image is modified in place when a crater appears,
+    so each frame only costs one copy of the background.
+    """
+    sprites = sprites or Sprites()
+    background = render_background(record)
+    sky = rgb(record.background)
+    for frame in ReplaySimulation(record).frames():
+        if frame.crater:
+            (x, y, r) = frame.crater
+            ImageDraw.Draw(background).ellipse((x-r, y-r, x+r, y+r), fill=sky)
+        image = background.copy()
+        for k, (x, y) in enumerate(record.players):
+            monkey = sprites.monkeys[k][frame.player_images[k]]
+            # the gorilla's (x,y) is bottom center of its image
+            image.paste(monkey, (int(x - monkey.width/2), int(y - monkey.height)), monkey)
+        draw = ImageDraw.Draw(image)
+        if frame.explosion:
+            (x, y, color, r) = frame.explosion
+            draw.ellipse((x-r, y-r, x+r, y+r), fill=rgb(color))
+        if frame.banana:
+            (x, y, index) = frame.banana
+            banana = sprites.bananas[index]
+            image.paste(banana, (int(x - banana.width/2), int(y - banana.height/2)), banana)
+        draw.text((20, 30), frame.message, fill=rgb(MESSAGE_COLOR))
+        yield image
+
+
+def bounded_map(function, items, workers=0):
+    """Apply function to each item, yielding results in order.
+
+    If workers > 0 the function is run in a thread pool, but at most
+    ENCODE_QUEUE_SIZE items are in progress at a time so memory stays bounded.
+    """
+    if workers <= 0:
+        yield from map(function, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= ENCODE_QUEUE_SIZE:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def encode_png(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def write_png_frames(frames, directory, workers=0) -> int:
+    """Write each frame to directory as frame00000.png, frame00001.png, ...
+    Returns the number of frames written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for data in bounded_map(encode_png, frames, workers):
+        with open(os.path.join(directory, f"frame{count:05d}.png"), "wb") as file:
+            file.write(data)
+        count += 1
+    return count
+
+
+def write_gif(frames, filename, duration=config.UPDATE_DELAY, workers=0) -> int:
+    """Write frames to an animated GIF file, one frame at a time.
+
+    Pillow's save_all keeps every frame in memory, so instead the GIF is
+    written incrementally: the header and palette are taken from the first
+    frame and every frame is quantized to that palette.
+    Returns the number of frames written.
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        return 0
+    palette = make_palette(first)
+
+    def encode(image):
+        image = image.quantize(palette=palette, dither=Image.Dither.NONE)
+        return b"".join(GifImagePlugin.getdata(image, duration=duration))
+
+    count = 0
+    with open(filename, "wb") as file:
+        screen = palette.crop((0, 0, first.width, first.height))
+        header, _ = GifImagePlugin.getheader(screen, info={"loop": 0})
+        file.write(b"".join(header))
+        for data in bounded_map(encode, _chain(first, frames), workers):
+            file.write(data)
+            count += 1
+        # GIF trailer
+        file.write(b";")
+    return count
+
+
+def make_palette(image) -> Image.Image:
+    """Create a 256 color palette from the colors in an image, the
+    explosion colors and the banana, which may appear in later frames.
+    """
+    colors = [rgb(color) for color in Explosion.COLORS]
+    banana = Image.open(BANANA_IMAGE).convert("RGB")
+    source = Image.new("RGB", (image.width, image.height + banana.height))
+    source.paste(image, (0, 0))
+    for k, color in enumerate(colors):
+        # a swatch of each color big enough to survive quantization
+        source.paste(color, (k*banana.width, image.height,
+                             (k+1)*banana.width, image.height + banana.height))
+    source.paste(banana, (len(colors)*banana.width, image.height))
+    return source.quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a recorded Gorilla game")
+    parser.add_argument("record", help="game record (JSON) saved by the game")
+    parser.add_argument("output", nargs="?", help="name of GIF file to create")
+    parser.add_argument("--png", metavar="DIR", help="write PNG frames to DIR")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of threads used to encode frames")
+    args = parser.parse_args()
+    if not args.output and not args.png:
+        parser.error("specify a GIF file or --png DIR")
+    record = GameRecord.load(args.record)
+    if args.png:
+        count = write_png_frames(render_frames(record), args.png, args.workers)
+    else:
+        count = write_gif(render_frames(record), args.output, workers=args.workers)
+    print(f"Wrote {count} frames")
+
+
+if __name__ == "__main__":
+    main()
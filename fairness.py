@@ -0,0 +1,186 @@
+"""
+Measure how fair a skyline is to the two players.
+
+For each player, count the throws that hit the other player, over every
+angle and speed a player can choose (angles are changed in steps of 5
+degrees and speeds in steps of 1).  The trajectories of all throws by
+both players are computed together using numpy arrays, one time step at
+a time, using the same motion and collision tests as state.GameState,
+so a skyline can be evaluated in a few tens of milliseconds.
+
+A layout where one gorilla is hidden behind a tall building has few
+or no winning throws for one player.  The fairness of a layout is the
+ratio of the two players' winning throws: 1.0 is perfectly fair and
+0.0 means one player cannot win.
+
+numpy is needed. If it is not installed, HAS_NUMPY is False and
+layouts are not checked for fairness.
+"""
+import math
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ModuleNotFoundError:
+    HAS_NUMPY = False
+from state import BANANA_WIDTH, BANANA_HEIGHT, MONKEY_WIDTH, MONKEY_HEIGHT, \
+        BANANA_FRAMES, MONKEY_FRAMES, BANANA_MASKS, MONKEY_MASKS
+import game_constants as config
+
+# Angles and speeds a player can choose, as in Banana
+ANGLES = range(-50, 91, 5)
+SPEEDS = range(1, config.MAX_BANANA_SPEED + 1)
+
+
+def player_positions(skyline, player_buildings):
+    """Return (x,y) of each player standing on the center of a building,
+    as in GorillaGame.add_players_to_game.
+    """
+    return [(skyline.xs[k] + skyline.widths[k]//2, skyline.top(k))
+            for k in player_buildings]
+
+
+def winning_throws(skyline, players, width=config.CANVAS_WIDTH,
+                   height=config.CANVAS_HEIGHT, angles=ANGLES, speeds=SPEEDS):
+    """Count the throws by each player that hit the other player.
+
+    Arguments:
+        skyline - a state.Skyline
+        players - (x,y) of each player, where y is the bottom of the gorilla
+    Returns:
+        a list of the number of winning throws for player 0 and player 1
+    """
+    (angle, speed) = np.meshgrid(np.radians(np.array(angles, dtype=float)),
+                                 np.array(speeds, dtype=float))
+    angle = angle.ravel()
+    speed = speed.ravel()
+    count = angle.size
+    # arrays of all throws, first by player 0 then by player 1
+    owner = np.repeat([0, 1], count)
+    x_axis = np.where(owner == 0, 1.0, -1.0)
+    x = np.repeat([float(players[0][0]), float(players[1][0])], count)
+    y = np.repeat([float(players[0][1]), float(players[1][1])], count) - MONKEY_HEIGHT - 10
+    vx = np.tile(np.cos(angle)*speed, 2)*x_axis
+    vy = np.tile(np.sin(angle)*speed, 2)
+    # buildings
+    lefts = np.array(skyline.xs, dtype=float)
+    rights = lefts + np.array(skyline.widths, dtype=float)
+    tops = skyline.baseline - np.array(skyline.heights, dtype=float)
+    baseline = skyline.baseline
+    last = len(lefts) - 1
+    # the 5 points of a banana tested for collision with buildings, as in Banana.hits
+    r = min(BANANA_WIDTH, BANANA_HEIGHT)
+    offset_x = np.array([0, r, -r, 0, 0], dtype=float)
+    offset_y = np.array([0, 0, 0, -r, r], dtype=float)
+    # distance from the center of a gorilla to where a banana can touch it
+    reach = (MONKEY_WIDTH + BANANA_WIDTH)/2 + 1
+    # nothing can be hit above the highest building or gorilla
+    ceiling = min(tops.min(), players[0][1] - MONKEY_HEIGHT, players[1][1] - MONKEY_HEIGHT)
+    wins = [0, 0]
+    # number of time steps since the bananas were thrown
+    step = 0
+    while x.size:
+        step += 1
+        # the thrower's image changes for the first steps of a throw, as
+        # in MonkeyState.update, and each banana spins from its first image
+        thrower_frame = step if step < MONKEY_FRAMES else 0
+        x += vx
+        y -= vy
+        vy -= config.GRAVITY
+        # banana is gone when it leaves the canvas
+        moving = (y <= height) & (x >= 0) & (x <= width)
+        # Only bananas low enough to touch a building or gorilla can hit
+        # something.  Test the 5 points of each of them for buildings, shape (n, 5).
+        near = np.flatnonzero(moving & (y + r > ceiling))
+        px = x[near, None] + offset_x
+        py = y[near, None] + offset_y
+        k = np.clip(np.searchsorted(lefts, px, side="right") - 1, 0, last)
+        hit_building = ((lefts[k] < px) & (px < rights[k])
+                        & (tops[k] < py) & (py < baseline)).any(axis=1)
+        flying = moving.copy()
+        # Bananas beside a gorilla are tested using the collision masks
+        close = near[(np.abs(x[near] - players[0][0]) < reach)
+                     | (np.abs(x[near] - players[1][0]) < reach)]
+        if close.size:
+            close_owner = owner[close]
+            banana_frames = (step*(2*close_owner - 1)) % BANANA_FRAMES
+            hit0 = gorilla_hits(players[0], 1, np.where(close_owner == 0, thrower_frame, 0),
+                                x[close], y[close], banana_frames)
+            # the game tests player 0 first, so a throw that hits both hits player 0
+            hit1 = gorilla_hits(players[1], -1, np.where(close_owner == 1, thrower_frame, 0),
+                                x[close], y[close], banana_frames) & ~hit0
+            wins[0] += int(np.count_nonzero(hit1 & (close_owner == 0)))
+            wins[1] += int(np.count_nonzero(hit0 & (close_owner == 1)))
+            flying[close[hit0 | hit1]] = False
+        flying[near[hit_building]] = False
+        if not flying.all():
+            x = x[flying]
+            y = y[flying]
+            vx = vx[flying]
+            vy = vy[flying]
+            owner = owner[flying]
+    return wins
+
+
+# tables of gorilla_hits for each direction of a gorilla
+_hit_tables = {}
+
+
+def hit_tables(x_axis):
+    """Return an array of bool, indexed by [gorilla image, banana image,
+    row, column], of the overlap_table of each pair of collision masks
+    of a gorilla facing the direction x_axis and a banana.
+    """
+    if x_axis not in _hit_tables:
+        _hit_tables[x_axis] = np.array([[monkey.overlap_table(banana) for banana in BANANA_MASKS]
+                                        for monkey in MONKEY_MASKS[x_axis]])
+    return _hit_tables[x_axis]
+
+
+def gorilla_hits(gorilla, x_axis, frames, x, y, banana_frames):
+    """Same test as MonkeyState.hit_by for arrays of bananas.
+
+    Arguments:
+        gorilla - (x,y) of the gorilla, where y is the bottom of its image
+        x_axis - direction the gorilla throws, 1 or -1
+        frames - image index of the gorilla, an int or an array like x
+        x, y - arrays of the positions of bananas
+        banana_frames - array of the image index of each banana
+    """
+    hits = np.zeros(x.shape, dtype=bool)
+    # bananas that are too far left or right can't touch the gorilla,
+    # and usually no banana is near the gorilla
+    near = np.flatnonzero(np.abs(x - gorilla[0]) < (MONKEY_WIDTH + BANANA_WIDTH)/2 + 1)
+    if not near.size:
+        return hits
+    tables = hit_tables(x_axis)
+    (height, width) = tables.shape[2:]
+    # top left corners of the images, as in mask_origin, give the
+    # offset of each banana in the table
+    left = math.floor(gorilla[0]) - MONKEY_WIDTH//2
+    top = math.floor(gorilla[1]) - MONKEY_HEIGHT
+    column = np.floor(x[near]).astype(int) - BANANA_WIDTH//2 - left + BANANA_WIDTH - 1
+    row = np.floor(y[near]).astype(int) - BANANA_HEIGHT//2 - top + BANANA_HEIGHT - 1
+    inside = (column >= 0) & (column < width) & (row >= 0) & (row < height)
+    near = near[inside]
+    if not np.isscalar(frames):
+        frames = frames[near]
+    hits[near] = tables[frames, banana_frames[near], row[inside], column[inside]]
+    return hits
+
+
+def fairness(wins) -> float:
+    """Ratio of the smaller to the larger number of winning throws.
+    Returns 0.0 if either player cannot win.
+    """
+    if max(wins) == 0:
+        return 0.0
+    return min(wins)/max(wins)
+
+
+def layout_fairness(skyline, player_buildings, width=config.CANVAS_WIDTH,
+                    height=config.CANVAS_HEIGHT) -> float:
+    """Return the fairness of a skyline with players standing on
+    the buildings with indices player_buildings.
+    """
+    players = player_positions(skyline, player_buildings)
+    return fairness(winning_throws(skyline, players, width, height))
@@ -25,3 +25,76 @@ GRAVITY = 1
 MAX_BANANA_SPEED = 99
 # A tag (string) used to identify gorilla objects on canvas
 GORILLA = "gorilla"
+# Directory where a record of each finished game is saved, for replay
+# or export as a GIF using export.py.  None means don't save records.
+REPLAY_DIR = None
+# File for a stream of game events (throws, banana positions, impacts, ...).
+# Names ending in .bin use a compact binary format, otherwise JSON Lines.
+# None means don't write game events.
+TELEMETRY_FILE = None
+# File used to save the game (F5 key) and resume it (F9 key)
+SAVE_FILE = "gorilla-save.json"
+# SQLite database of players, matches, throws and ratings.
+# None means don't save results.
+RESULTS_DB = None
+# Minimum fairness of a new layout of buildings and players, from 0 to 1.
+# Fairness is the ratio of the number of winning throws of the two players
+# (see fairness.py).  0 means don't check the fairness of layouts.
+# Checking fairness requires numpy.
+FAIRNESS_THRESHOLD = 0.5
+# Milliseconds the game may spend checking the fairness of new layouts,
+# since it is done by the game's thread.  After that, the fairest layout
+# checked is used.  None means no limit.
+LAYOUT_TIME_LIMIT = 50
+# File of pre-generated layouts of buildings and players, created using
+# skyline_library.py.  None means generate a new layout for each game.
+SKYLINE_LIBRARY = None
+# Number of bananas in a volley (thrown using the "v" key), and the
+# difference in angle (degrees) between bananas in a volley.
+# Volleys require numpy.
+VOLLEY_SIZE = 5
+VOLLEY_SPREAD = 5
+# Maximum number of bananas of volleys in flight at the same time
+MAX_PROJECTILES = 64
+# Warn (using monitor.LeakWarning) if the number of canvas items or game
+# elements left when the canvas is cleared for a new game grows by more
+# than LEAK_ITEMS_PER_GAME per game.  If
+# LEAK_MEMORY_PER_GAME is not None, also warn if Python memory grows by
+# more than that many bytes per game; tracing memory makes the game slower.
+LEAK_MONITOR = False
+LEAK_ITEMS_PER_GAME = 5
+LEAK_MEMORY_PER_GAME = None
+# Measure the time from each key press until it is drawn on the screen,
+# and print the times for each action when the game exits (see latency.py).
+LATENCY_TRACE = False
+# Milliseconds between changes of the window lights and the time of day,
+# such as 1000, or 0 for lights that don't change and a night sky
+# (CANVAS_COLOR), as in the original game.
+AMBIENCE_DELAY = 0
+# Number of changes in one day, from night to day to night
+DAY_LENGTH = 240
+# Port on localhost where spectators can watch the game (see broadcast.py),
+# or None for no broadcast.  0 means any free port.
+BROADCAST_PORT = None
+# Controller of each player: "human", "human:name", "bot", or "host:port"
+# of a remote player (see controllers.py).  Match results are saved using
+# the name of a human player, or are asked for if it isn't given.
+PLAYER_CONTROLLERS = ("human", "human")
+# Seconds a bot or remote player may take to choose a throw.  After that,
+# the player throws using the previous angle and speed.
+DECISION_TIMEOUT = 10
+# Milliseconds between checks for the throw chosen by a bot or remote player
+DECISION_POLL = 50
+# Milliseconds the winner is shown before a new game starts, in a game
+# between bots or remote players.  0 means wait for Enter or a click.
+AUTO_REMATCH_DELAY = 3000
+# Timer of several games in one window (see boards.py): milliseconds
+# between ticks, and milliseconds of callbacks run in one tick.
+BOARD_TICK = 10
+BOARD_BUDGET = 20
+# Milliseconds that a +, -, Up or Down key is held before it repeats,
+# milliseconds between the first two repeats, and the factor that makes each
+# interval between repeats shorter, down to one frame (see keyinput.py)
+KEY_REPEAT_DELAY = 400
+KEY_REPEAT_INTERVAL = 150
+KEY_REPEAT_ACCELERATION = 0.85
@@ -1,7 +1,303 @@
 import tkinter as tk
 import tkinter.ttk as ttk
+import heapq
+import itertools
+import math
+import time
+import weakref
 # use ImageTk for improved PhotoImage class
-from PIL import ImageTk
+from PIL import Image, ImageTk
+
+
+class RetainedProperties:
+    """Options of canvas items and widgets, applied once per frame.
+
+    Instead of calling canvas.itemconfigure() or widget.configure()
+    directly, call set_item() or set_widget().  The new values are kept
+    until flush(), which is called when Tk is idle (after the current frame
+    or event handler), and only options whose values changed are sent to Tk.
+    Repeated updates of the same object in one frame are combined.
+
+    Attributes:
+    issued = number of Tk configure calls made
+    avoided = number of Tk calls avoided because nothing changed, or
+              because several updates were combined into one
+    """
+    # RetainedProperties for each canvas (or other widget)
+    _instances = weakref.WeakKeyDictionary()
+
+    def __init__(self, widget):
+        """widget is used to schedule flush() when Tk is idle."""
+        self.widget = widget
+        self.issued = 0
+        self.avoided = 0
+        # pending and last applied options, keyed by (canvas, item) or widget
+        self._pending = {}
+        self._applied = {}
+        self._flush_id = None
+
+    @classmethod
+    def of(cls, widget):
+        """Return the RetainedProperties for a widget, such as a canvas."""
+        if widget not in cls._instances:
+            cls._instances[widget] = cls(widget)
+        return cls._instances[widget]
+
+    def set_item(self, canvas, item, **options):
+        """Set options of a canvas item, as in canvas.itemconfigure."""
+        self._set((canvas, item), options)
+
+    def set_widget(self, widget, **options):
+        """Set options of a widget, as in widget.configure."""
+        self._set(widget, options)
+
+    def _set(self, key, options):
+        if key in self._pending:
+            # combined with an earlier update in this frame
+            self._pending[key].update(options)
+            self.avoided += 1
+        else:
+            self._pending[key] = dict(options)
+        if not self._flush_id:
+            self._flush_id = self.widget.after_idle(self.flush)
+
+    def flush(self):
+        """Apply the options that changed since the last flush."""
+        if self._flush_id:
+            self.widget.after_cancel(self._flush_id)
+            self._flush_id = None
+        pending = self._pending
+        self._pending = {}
+        for key, options in pending.items():
+            applied = self._applied.setdefault(key, {})
+            changed = {name: value for name, value in options.items()
+                       if applied.get(name) != value}
+            if not changed:
+                self.avoided += 1
+                continue
+            if isinstance(key, tuple):
+                (canvas, item) = key
+                canvas.itemconfigure(item, **changed)
+            else:
+                key.configure(**changed)
+            applied.update(changed)
+            self.issued += 1
+
+    def forget(self, key=None):
+        """Forget pending and applied options of a canvas item or
+        widget that was deleted, or of everything if key is None.
+        """
+        if key is None:
+            self._pending.clear()
+            self._applied.clear()
+        else:
+            self._pending.pop(key, None)
+            self._applied.pop(key, None)
+
+
+class BufferedCanvas:
+    """A canvas that collects the commands that change its items, such as
+    coords, move, itemconfigure, scale and delete, and sends them to Tcl
+    as one script when flush() is called, instead of one call per command.
+
+    flush() is called at the end of each animation frame, and also when
+    Tk is idle, so commands made outside of a frame are drawn, too.
+    Other canvas methods, such as create_image or tag_raise, flush the
+    buffer and then call the canvas, so commands are done in order.
+
+    coords() and bbox() of an item are computed from the buffered commands,
+    without flushing, when the item's position was set or its bbox was
+    read before.  The bbox of an item is assumed to move with its position,
+    as for images and text, until its other options are changed.
+    """
+    # itemconfigure options that don't change the bbox of an item
+    COLOR_OPTIONS = {"fill", "outline", "activefill", "activeoutline", "disabledfill"}
+
+    def __init__(self, canvas: tk.Canvas):
+        self.canvas = canvas
+        self._name = str(canvas)
+        self._commands = []
+        self._flush_id = None
+        # last known (x, y) of items positioned by a single point
+        self._points = {}
+        # bbox of items, moved when the items are moved
+        self._bboxes = {}
+        self.commands = 0
+        self.flushes = 0
+
+    def __getattr__(self, name):
+        """Flush, then use the canvas for methods not buffered.
+        Timers and window information don't need a flush.
+        """
+        attribute = getattr(self.canvas, name)
+        if callable(attribute) and not name.startswith(("after", "winfo_")):
+            def flush_and_call(*args, **kwargs):
+                self.flush()
+                return attribute(*args, **kwargs)
+            return flush_and_call
+        return attribute
+
+    def __getitem__(self, option):
+        return self.canvas[option]
+
+    def __setitem__(self, option, value):
+        self.flush()
+        self.canvas[option] = value
+
+    def __str__(self):
+        return self._name
+
+    def _add(self, *words):
+        self._commands.append(" ".join(tcl_word(word) for word in words))
+        self.commands += 1
+        if not self._flush_id:
+            self._flush_id = self.canvas.after_idle(self.flush)
+
+    def _forget(self, item):
+        """Forget the position and bbox of an item, or of all items
+        if item is a tag or "all".
+        """
+        if isinstance(item, int):
+            self._points.pop(item, None)
+            self._bboxes.pop(item, None)
+        else:
+            self._points.clear()
+            self._bboxes.clear()
+
+    def coords(self, item, *args):
+        if not args:
+            if item in self._points:
+                return list(self._points[item])
+            self.flush()
+            return self.canvas.coords(item)
+        if len(args) == 1:
+            args = args[0]
+        self._add(self._name, "coords", item, *args)
+        if item in self._points and len(args) == 2:
+            (x, y) = self._points[item]
+            self._moved(item, args[0] - x, args[1] - y)
+        else:
+            self._forget(item)
+            if isinstance(item, int) and len(args) == 2:
+                self._points[item] = (args[0], args[1])
+
+    def move(self, item, dx, dy):
+        self._add(self._name, "move", item, dx, dy)
+        if item in self._points or item in self._bboxes:
+            self._moved(item, dx, dy)
+        else:
+            self._forget(item)
+
+    def _moved(self, item, dx, dy):
+        """Move the known position and bbox of an item."""
+        if item in self._points:
+            (x, y) = self._points[item]
+            self._points[item] = (x + dx, y + dy)
+        if item in self._bboxes:
+            (x1, y1, x2, y2) = self._bboxes[item]
+            self._bboxes[item] = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+    def scale(self, item, x, y, xscale, yscale):
+        self._add(self._name, "scale", item, x, y, xscale, yscale)
+        self._forget(item)
+
+    def delete(self, *items):
+        self._add(self._name, "delete", *items)
+        for item in items:
+            self._forget(item)
+
+    def itemconfigure(self, item, **options):
+        if not options:
+            self.flush()
+            return self.canvas.itemconfigure(item)
+        words = []
+        for name, value in options.items():
+            words.extend(("-" + name.rstrip("_"), value))
+        self._add(self._name, "itemconfigure", item, *words)
+        if not self.COLOR_OPTIONS.issuperset(options):
+            if isinstance(item, int):
+                self._bboxes.pop(item, None)
+            else:
+                self._forget(item)
+
+    itemconfig = itemconfigure
+
+    def create(self, item_type, *args, **options):
+        """Create an item, such as a "rectangle", using a buffered command.
+        Use this for items that are only changed using tags, since
+        the id of the new item isn't returned.
+        """
+        words = []
+        for name, value in options.items():
+            words.extend(("-" + name.rstrip("_"), value))
+        self._add(self._name, "create", item_type, *args, *words)
+
+    def script(self, commands, items=()):
+        """Add Tcl commands (strings) made by other code, such as
+        ProjectileManager, so they run in order with the buffered commands.
+        items are the items the commands change; their known positions
+        and bboxes are forgotten.
+        """
+        for item in items:
+            self._forget(item)
+        if not commands:
+            return
+        self._commands.extend(commands)
+        self.commands += len(commands)
+        if not self._flush_id:
+            self._flush_id = self.canvas.after_idle(self.flush)
+
+    def bbox(self, item):
+        if item in self._bboxes:
+            return self._bboxes[item]
+        self.flush()
+        bbox = self.canvas.bbox(item)
+        if bbox and isinstance(item, int):
+            self._bboxes[item] = tuple(bbox)
+        return bbox
+
+    def flush(self):
+        """Send the buffered commands to Tcl as one script."""
+        if self._flush_id:
+            self.canvas.after_cancel(self._flush_id)
+            self._flush_id = None
+        # options of canvas items set this frame are applied, too
+        properties = RetainedProperties._instances.get(self)
+        if properties:
+            properties.flush()
+        if self._commands:
+            script = "\n".join(self._commands)
+            self._commands = []
+            self.flushes += 1
+            self.canvas.tk.eval(script)
+
+
+def tcl_word(value) -> str:
+    """Quote a value as one word of a Tcl command."""
+    if isinstance(value, (tuple, list)):
+        value = " ".join(tcl_word(element) for element in value)
+    elif isinstance(value, float):
+        return repr(float(value))
+    value = str(value)
+    if value and value[0] != "#" and all(c.isalnum() or c in "_-.,:/#+@%" for c in value):
+        return value
+    if not value:
+        return "{}"
+    return "".join(_tcl_char(c) for c in value)
+
+
+def _tcl_char(c) -> str:
+    """Quote one character of a Tcl word.  Control characters are written
+    as \\uHHHH, which always has 4 digits, so it doesn't take the next char.
+    A "#" is quoted, since it starts a comment at the start of a command.
+    """
+    if c == "\n":
+        return "\\n"
+    if c < " " or c == "\x7f":
+        return f"\\u{ord(c):04x}"
+    if c in ' \t\\{}[]$";#':
+        return "\\" + c
+    return c
 
 
 class GameCanvasElement:
@@ -16,6 +312,8 @@ class GameCanvasElement:
     By default the (x,y) coordinate are at the center of the image,
     but this can be changed by subclasses or calls to canvas.itemconfigure().
     """
+    # all elements that are still referenced, for finding leaks (see monitor.py)
+    instances = weakref.WeakSet()
 
     def __init__(self, canvas, x=0, y=0, **kwargs):
         self.x = x
@@ -24,8 +322,13 @@ class GameCanvasElement:
         #self.app = game_app
         self._canvas = canvas
         self.is_visible = True
+        # updates of canvas options are applied once per frame, if changed
+        self.properties = RetainedProperties.of(canvas)
+        # position where the element was last drawn, or None if unknown
+        self.rendered_at = None
         self.canvas_object_id = self.init_canvas_object(**kwargs)
         self.init_element()
+        GameCanvasElement.instances.add(self)
 
     def init_canvas_object(self, **kwargs) -> int:
         """Initialize a graphical object to show on self.canvas.
@@ -53,8 +356,20 @@ class GameCanvasElement:
         self.canvas.itemconfigure(self.canvas_object_id, state=tk.HIDDEN)
 
     def render(self):
+        """Move the canvas object to (x,y), if it isn't already there."""
         if self.is_visible:
+            position = (self.x, self.y)
+            if position == self.rendered_at:
+                self.properties.avoided += 1
+                return
             self.canvas.coords(self.canvas_object_id, self.x, self.y)
+            self.rendered_at = position
+
+    def invalidate(self):
+        """Forget where the object was drawn, after it was moved some
+        other way, so that the next render() will move it.
+        """
+        self.rendered_at = None
 
     def update(self):
         pass
@@ -84,32 +399,58 @@ class Text(GameCanvasElement):
         return object_id
 
     def set_text(self, text):
+        """Change the text. The canvas is updated when Tk is idle,
+        and only if the text is different.
+        """
         self.text = text
-        self._canvas.itemconfigure(self.canvas_object_id, text=text)
+        self.properties.set_item(self._canvas, self.canvas_object_id, text=text)
 
     def append_text(self, text):
         self.set_text(self.text + text)
 
     def set_color(self, color):
-        self._canvas.itemconfigure(self.canvas_object_id, color=color)
+        self.properties.set_item(self._canvas, self.canvas_object_id, fill=color)
 
 
 class Sprite(GameCanvasElement):
-    """A canvas element with an image."""
+    """A canvas element with an image.
+
+    PhotoImages are shared by all sprites that show the same image, even
+    sprites of different games, so a sprite must not change its PhotoImage
+    (e.g. using paste).  It shows a different image using show_image().
+    """
+    # PhotoImages shared by all sprites, see shared_images()
+    _shared_images = {}
 
     def __init__(self, canvas, image_filename, x=0, y=0):
         self.image_filename = image_filename
         super().__init__(canvas, x, y)
 
+    @classmethod
+    def shared_images(cls, key, load) -> list:
+        """Return a list of PhotoImages shared by all sprites.
+        The first time key is used, load() is called to get a list
+        of PIL images, and a PhotoImage is made for each image.
+        """
+        if key not in cls._shared_images:
+            cls._shared_images[key] = [ImageTk.PhotoImage(image) for image in load()]
+        return cls._shared_images[key]
+
     def init_canvas_object(self):
-        #self.image = tk.PhotoImage(file=self.image_filename)
-        self.image = ImageTk.PhotoImage(file=self.image_filename)
+        filename = self.image_filename
+        self.image = Sprite.shared_images(filename, lambda: [Image.open(filename)])[0]
         object_id = self.canvas.create_image(
                 self.x,
                 self.y,
                 image=self.image)
         return object_id
 
+    def show_image(self, image):
+        """Show a different PhotoImage, which must have the same size."""
+        if image is not self.image:
+            self.image = image
+            self.canvas.itemconfigure(self.canvas_object_id, image=image)
+
     @property
     def height(self):
         """Return the height of the Sprite's image."""
@@ -121,12 +462,110 @@ class Sprite(GameCanvasElement):
         return self.image.width() if self.image else 0
 
 
+class TkScheduler:
+    """Schedule callbacks using the Tk after() timer.
+    This is the default scheduler of a GameApp.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+
+    def call_later(self, delay, callback) -> str:
+        """Call callback after delay milliseconds. Returns a timer id."""
+        return self.widget.after(delay, callback)
+
+    def cancel(self, timer_id):
+        self.widget.after_cancel(timer_id)
+
+
+class FrameScheduler:
+    """Schedule the callbacks of several games, such as a tournament view
+    with many boards in one window, using a single Tk after() timer.
+
+    Callbacks that are due run together in one tick, oldest deadline
+    first.  When a tick has run for budget milliseconds, the callbacks that
+    are still due wait for the next tick, which is at least tick milliseconds
+    later, so Tk can draw and handle events in between.  They are then the
+    oldest, so each board gets its turn and a slow board can't starve the others.
+
+    Attributes:
+    ticks = number of ticks run
+    deferred = number of callbacks that were due, but waited for the next tick
+    """
+
+    def __init__(self, widget, tick=10, budget=20):
+        self.widget = widget
+        self.tick = tick
+        self.budget = budget
+        # heap of [deadline, sequence, callback].  A cancelled timer's
+        # callback is None, and it is discarded when it reaches the top.
+        self._timers = []
+        self._sequence = itertools.count()
+        self._timer_id = None
+        self._timer_deadline = math.inf
+        self._last_tick = -math.inf
+        self.ticks = 0
+        self.deferred = 0
+
+    def call_later(self, delay, callback) -> list:
+        """Call callback after delay milliseconds. Returns a timer id."""
+        timer = [time.perf_counter() + delay/1000, next(self._sequence), callback]
+        heapq.heappush(self._timers, timer)
+        self._set_timer()
+        return timer
+
+    def cancel(self, timer_id):
+        timer_id[2] = None
+
+    def _set_timer(self):
+        """Set the Tk timer for the next tick, when the first callback is due,
+        but no sooner than tick milliseconds after the last tick.
+        """
+        timers = self._timers
+        while timers and timers[0][2] is None:
+            heapq.heappop(timers)
+        if not timers:
+            return
+        deadline = max(timers[0][0], self._last_tick + self.tick/1000)
+        if deadline >= self._timer_deadline:
+            return
+        if self._timer_id:
+            self.widget.after_cancel(self._timer_id)
+        delay = max(0, math.ceil((deadline - time.perf_counter())*1000))
+        self._timer_id = self.widget.after(delay, self._run)
+        self._timer_deadline = deadline
+
+    def _run(self):
+        """Run the callbacks that are due, until the budget is used."""
+        self._timer_id = None
+        self._timer_deadline = math.inf
+        now = self._last_tick = time.perf_counter()
+        self.ticks += 1
+        end = now + self.budget/1000
+        timers = self._timers
+        # callbacks scheduled by these callbacks are due after now, so they wait
+        while timers and timers[0][0] <= now:
+            timer = heapq.heappop(timers)
+            callback = timer[2]
+            if callback is None:
+                continue
+            # a timer can't be cancelled after it runs
+            timer[2] = None
+            callback()
+            if time.perf_counter() > end:
+                self.deferred += sum(1 for timer in timers
+                                     if timer[0] <= now and timer[2] is not None)
+                break
+        self._set_timer()
+
+
 class GameApp(ttk.Frame):
     """Base class for a game.  This class creates a canvas
     and provides several call-back methods for initializing elements
     on the canvas, start/stop animation, and running the animation loop.
     """
-    def __init__(self, parent, canvas_width, canvas_height, update_delay=33):
+    def __init__(self, parent, canvas_width, canvas_height, update_delay=33,
+                 scheduler=None):
         super().__init__(parent, width=canvas_width, height=canvas_height)
         self.parent = parent
         self.update_delay = update_delay
@@ -139,20 +578,47 @@ class GameApp(ttk.Frame):
         # The timer_id keeps a reference to the animation timer.
         # It is empty string if timer is stopped.
         self.timer_id = ""
+        # The scheduler runs the animation timer. See set_scheduler().
+        self.scheduler = scheduler or TkScheduler(self)
         self.elements = []
         self.init_game()
         # bind callback for event handlers
         self.parent.bind('<KeyPress>', self.on_key_pressed)
         self.parent.bind('<KeyRelease>', self.on_key_released)
 
-    def create_canvas(self, canvas_width, canvas_height) -> tk.Canvas:
+    def create_canvas(self, canvas_width, canvas_height) -> BufferedCanvas:
         canvas = tk.Canvas(self,
                            borderwidth=0,
                            width=canvas_width,
                            height=canvas_height,
                            highlightthickness=0)
         canvas.grid(row=0, sticky=tk.NSEW)
-        return canvas
+        # canvas commands of each frame are sent to Tcl together
+        return BufferedCanvas(canvas)
+
+    def set_scheduler(self, scheduler):
+        """Use a different scheduler for the animation timer, such as
+        an aioloop.AsyncioScheduler.  The scheduler must have methods
+        call_later(delay, callback) and cancel(timer_id).
+        A scheduler passed to the constructor (such as a FrameScheduler
+        shared by several games) is used for every timer of the game,
+        including timers started by the constructor.
+        """
+        running = self.running()
+        self.stop()
+        self.scheduler = scheduler
+        if running:
+            self.start()
+
+    def schedule(self, delay, callback):
+        """Call callback after delay milliseconds using the scheduler.
+        Returns a timer id that can be passed to cancel().
+        """
+        return self.scheduler.call_later(delay, callback)
+
+    def cancel(self, timer_id):
+        """Cancel a callback scheduled using schedule()."""
+        self.scheduler.cancel(timer_id)
 
     def add_element(self, element):
         """Add an element to list of animated elements. 
@@ -173,23 +639,25 @@ class GameApp(ttk.Frame):
 
         A subclass may override this to provide it's own animation.
         A subclass should be careful to set self.timer_id to the value
-        returned by animate().
+        returned by schedule().
         """
         for element in self.elements:
             element.update()
             element.render()
+        # apply the changes of this frame
+        self.canvas.flush()
 
-        self.timer_id = self.after(self.update_delay, self.animate)
+        self.timer_id = self.schedule(self.update_delay, self.animate)
 
     def start(self):
         """Start the animation loop if not already running."""
         if not self.timer_id:
-            self.timer_id = self.after(0, self.animate)
+            self.timer_id = self.schedule(0, self.animate)
 
     def stop(self):
         """Stop the animation loop."""
         if self.timer_id:
-            self.after_cancel(self.timer_id)
+            self.cancel(self.timer_id)
             self.timer_id = ""
 
     def stopped(self) -> bool:
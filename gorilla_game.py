@@ -2,16 +2,43 @@ import tkinter as tk
 from tkinter import ttk
 import tkinter.font as font
 import tkinter.simpledialog as dialog
-import tkinter.messagebox as messagebox
-from random import randint
+import itertools
+import json
+import os
+import time
+from array import array
 
-from gamelib import GameApp, Text
-from building import BuildingFactory
-from explosion import Explosion
+from gamelib import GameApp, Text, RetainedProperties
+from building import Building, BuildingFactory, SKYLINE
+from explosion import Explosion, ExplosionPool, Crater, CRATER
+from projectiles import ProjectileManager, HAS_NUMPY
+from replay import GameRecord
+from state import GameState, Skyline, BananaState, ExplosionState, \
+        IDLE, THROWING, EXPLODING
+from telemetry import open_telemetry
+from results import MatchResult, open_results
+from skyline_library import open_library
+from monitor import open_monitor
+from latency import open_tracer
+from ambience import Ambience
+from broadcast import open_broadcaster
+from controllers import create_controller, Decisions
+from keyinput import KeyInput
 import game_constants as config
 # avoid circular imports
 import monkey
 
+# Action of each key (char or keysym), for latency tracing.
+# These keys are handled once per frame, see read_keys().
+KEY_ACTIONS = {'+': "speed", '-': "speed", "Up": "angle", "Down": "angle",
+               ' ': "throw", 'v': "volley"}
+# Keys that repeat while they are held
+REPEATING_KEYS = ('+', '-', "Up", "Down")
+# Numbers of saved records, which are unique in a process
+RECORD_NUMBERS = itertools.count(1)
+# A tag used to identify the canvas items that show the winner of a game
+GAME_OVER = "game-over"
+
 
 class GorillaGame(GameApp):
     """The main class for the Gorilla game consists of a canvas
@@ -21,59 +48,160 @@ class GorillaGame(GameApp):
     and shows the players' scores.
     """
 
-    def __init__(self, *args):
+    def __init__(self, *args, scheduler=None, controllers=config.PLAYER_CONTROLLERS,
+                 telemetry=None, results=None, latency=None, broadcast=None):
+        """args are the parent widget, canvas width and height, and update delay,
+        as for GameApp.  scheduler runs the game's timers, see GameApp.set_scheduler.
+        controllers are the names of the controllers of the players.
+        telemetry, results, latency and broadcast are opened using the
+        settings in game_constants if they are None.  Several games in one
+        process pass their own, see boards.py.
+        """
         self.player_index = 1    # Index of player to take a turn, pre-updated by next_player()
         # Cludge. Keep separate objects for scores.
         self.scores = [tk.IntVar(), tk.IntVar()]
-        super().__init__(*args)
+        # canvas and widget options are applied once per frame, if changed
+        self.properties = None
+        # structured stream of game events, see telemetry.py
+        self.telemetry = telemetry or open_telemetry(config.TELEMETRY_FILE)
+        # database of match results and ratings, written in the background
+        self.results = results or open_results(config.RESULTS_DB)
+        # pre-generated layouts, or None to generate a new layout for each game
+        self.skyline_library = open_library(config.SKYLINE_LIBRARY,
+                                            args[1], args[2])
+        # warns when canvas items or memory grow from game to game
+        self.monitor = open_monitor(config.LEAK_MONITOR, config.LEAK_ITEMS_PER_GAME,
+                                    config.LEAK_MEMORY_PER_GAME)
+        # time from key press to screen, by action (args[0] is the parent widget)
+        self.latency = latency or open_tracer(config.LATENCY_TRACE, args[0])
+        # sends the game to spectators, see broadcast.py
+        self.broadcast = broadcast or open_broadcaster(config.BROADCAST_PORT)
+        # time of day and window lights
+        self.ambience = Ambience()
+        # chooses the throws of each player, see controllers.py
+        self.controllers = [create_controller(name) for name in controllers]
+        # runs the decisions of bots and remote players in worker threads or processes
+        self.decisions = Decisions(config.DECISION_TIMEOUT)
+        # id of the decision the current player is waiting for, or None
+        self.decision_id = None
+        self.decision_timer = None
+        # (layout, player_buildings) chosen for the next game, or None
+        self.next_layout = None
+        super().__init__(*args, scheduler=scheduler)
+        # keys of actions are recorded, and handled once per frame by read_keys()
+        self.keys = KeyInput(self.update_delay, REPEATING_KEYS)
+        self.input_timer = None
+        # key releases aren't received without the focus
+        self.parent.bind('<FocusOut>', lambda event: self.keys.clear())
+        # a click after a game ends starts a new game
+        self.canvas.bind("<Button-1>", self.on_click)
+        if config.AMBIENCE_DELAY:
+            self.schedule(config.AMBIENCE_DELAY, self.update_ambience)
 
-    def init_game(self):
+    def init_game(self, state: GameState = None):
         """This method is called by the superclass (GameApp) constructor
         to initialize game elements.
+        If state is a GameState, the game is restored to that state.
         """
-        self.canvas['bg'] = config.CANVAS_COLOR
+        self.canvas['bg'] = self.ambience.sky
+        # decisions for the previous game are ignored
+        self.decisions.cancel()
+        self.decision_id = None
+        self.properties = RetainedProperties.of(self.canvas)
+        if self.elements:
+            # sample what the last game leaves behind, as in rematch(),
+            # before everything is deleted
+            self.canvas.delete(SKYLINE, CRATER)
+            self.monitor.new_game(self.canvas)
         self.clear_canvas()
-        self.init_game_objects()
-        # handle mouse clicks (not actually used now)
-        self.parent.bind("<Button-1>", self.on_click)
+        self.init_game_objects(state)
         self.init_control_panel()
-        # Set next player to take a turn and the animation state
-        self.next_player()
+        if state:
+            self.restore_state(state)
+        else:
+            # Set next player to take a turn and the animation state
+            self.next_player()
+        # the state at the start of this game, for a rematch on the same layout
+        self.initial_state = state.new_game() if state else self.snapshot()
+        self.broadcast.keyframe(self.snapshot())
 
-    def init_game_objects(self):
-        """Initial objects on the game canvas."""
+    def init_game_objects(self, state: GameState = None):
+        """Initial objects on the game canvas.
+        If state is a GameState, use the skyline of that state.
+        """
         # draw buildings before gorillas   
-        self.buildings = BuildingFactory.create_buildings(self.canvas)
-        for bldg in self.buildings:  self.add_element(bldg)
+        player_buildings = self.create_skyline(state)
         self.create_players()
-        self.add_players_to_game()
+        self.add_players_to_game(player_buildings)
         # craters are the holes left by explosions
         # keep track of them so that subsequent throws can pass through holes
         self.craters = []
+        # reusable canvas items for drawing explosions
+        self.explosion_pool = ExplosionPool(self.canvas)
+        # bananas thrown in volleys, all moved together (requires numpy)
+        self.projectiles = ProjectileManager(self.canvas, 'images/banana.png') \
+                           if HAS_NUMPY else None
+        self.explosions = []
+        # number of volleys thrown in this game, which are not in the record
+        self.volleys = 0
         self.create_message_box()
+        # record the layout and throws, so the game can be replayed
+        self.record = GameRecord.from_game(self)
+
+    def create_skyline(self, state: GameState = None, next_layout=None):
+        """Create the buildings, using the skyline of state if given,
+        or next_layout (layout, player_buildings) if given.
+        Returns the indices of the buildings for the players to stand on,
+        or None to choose them randomly.
+        """
+        if state:
+            self.skyline = state.skyline
+            self.buildings = BuildingFactory.create_buildings_for_skyline(
+                                    self.canvas, state.skyline)
+            player_buildings = None
+        elif self.skyline_library is not None:
+            (self.buildings, player_buildings) = \
+                    BuildingFactory.create_buildings_from_library(self.canvas,
+                                                                  self.skyline_library)
+            self.skyline = Skyline.from_buildings(self.buildings)
+        else:
+            # choose a layout that is fair to both players
+            (layout, player_buildings) = next_layout or BuildingFactory.create_layout(
+                    int(self.canvas['width']), int(self.canvas['height']))
+            self.buildings = BuildingFactory.create_buildings(self.canvas, layout)
+            self.skyline = Skyline.from_buildings(self.buildings)
+        for bldg in self.buildings:  self.add_element(bldg)
+        return player_buildings
 
     def clear_canvas(self):
         """Remove all objects from the canvas."""
-        for id in self.canvas.find_all():
-            self.canvas.delete(id)
+        self.canvas.delete(tk.ALL)
         self.elements.clear()
+        # the game over message is created again when needed
+        self.game_over_text = None
+        # forget the options of deleted items and the old control panel
+        self.properties.forget()
 
-    def add_players_to_game(self):
+    def add_players_to_game(self, player_buildings=None):
         """After creating players and buildings, position the players on top of buildings.
+        player_buildings are the indices of the buildings for each player to stand on.
+        If None, buildings are chosen randomly.
         """
-        center_building = len(self.buildings)//2
+        self.place_players(player_buildings)
+        for player in self.players:
+            # add player as a canvas element?
+            self.add_element(player)
+
+    def place_players(self, player_buildings=None):
+        """Move the players to the top of buildings."""
+        if player_buildings is None:
+            # This assumes buildings ordered left to right.
+            player_buildings = BuildingFactory.choose_player_buildings(len(self.buildings))
         for k in (0,1):
-            # Randomly choose a building to stand on, such that player 0 is on
-            # left and player 1 is on right.  This assumes buildings ordered left to right.
-            bldg_number = randint(0, min(2,center_building-1))
-            if k == 1: # player 1 count buildings from right edge
-                bldg_number = len(self.buildings) -1 - bldg_number
-            building = self.buildings[bldg_number]
+            building = self.buildings[player_buildings[k]]
             player_x = building.x + building.width//2
             player_y = building.top
             self.players[k].move_to(player_x, player_y)
-            # add player as a canvas element?
-            self.add_element(self.players[k])
 
     def create_players(self):
         """Create the players, consisting of monkeys and their bananas.
@@ -127,10 +255,10 @@ class GorillaGame(GameApp):
         # Speed of banana toss and controls to change it
         self.speed_text = tk.Label(controls, text="Speed: 00")
         self.buttonMinus = tk.Button(controls, text="-", 
-                command=lambda : self.increase_speed(-1)
+                command=lambda : self.control(self.increase_speed, -1)
                 )
         self.buttonPlus = tk.Button(controls, text="+",
-                command=lambda : self.increase_speed(1)
+                command=lambda : self.control(self.increase_speed, 1)
                 )
         # leave some space
         tk.Label(controls, text="  ")
@@ -139,15 +267,15 @@ class GorillaGame(GameApp):
         # up arrow \u2191, down arrow \u2193, triple up \u290A, triple down \u290B
         # upward solid triangle 25B2 small 25B4, downward solid triangle 25BC small 25BE
         self.angleDown = tk.Button(controls, text="\u25BE",
-                command=lambda: self.increase_angle(-5)
+                command=lambda: self.control(self.increase_angle, -5)
                 )
         self.angleUp = tk.Button(controls, text="\u25B4",
-                command=lambda : self.increase_angle(5)
+                command=lambda : self.control(self.increase_angle, 5)
                 )
         # Button to throw banana
         tk.Label(controls, text="  ")
         self.throw_button = tk.Button(controls, text="Throw!",
-                command = self.throw_banana)
+                command = lambda: self.control(self.throw_banana))
         tk.Label(controls, text="   ")
         # Name and score of player 2
         self.player2 = tk.Label(controls, text=self.players[1].name+":", fg=config.SCOREBOARD_COLOR)
@@ -161,29 +289,79 @@ class GorillaGame(GameApp):
     def increase_speed(self, amount):
         """Increase the speed by amount. Decreases speed if amount less than 0."""
         self.banana.speed += amount
-        self.speed_text['text'] = f'Speed: {self.banana.speed:2d}'
+        self.properties.set_widget(self.speed_text, text=f'Speed: {self.banana.speed:2d}')
 
     def increase_angle(self, degrees):
         """Increase the angle for throwing banana by degrees."""
         self.banana.angle += degrees
-        self.angle_text['text'] = f"Angle: {self.banana.angle:2d}"
+        self.properties.set_widget(self.angle_text, text=f"Angle: {self.banana.angle:2d}")
+
+    def control(self, action, *args):
+        """Perform an action of the control panel, if the current player
+        is controlled by a human.
+        """
+        if self.controller.is_human:
+            action(*args)
 
     def on_key_pressed(self, event):
         # log("Key Pressed:", event)
-        if event.char == '+':
-            self.increase_speed(1)
-        elif event.char == '-':
-            self.increase_speed(-1)
-        elif event.keysym == "Up":
-            self.increase_angle(5)
-        elif event.keysym == "Down":
-            self.increase_angle(-5)
-        elif event.char == ' ':
-            self.throw_banana()
+        key = event.char if event.char in KEY_ACTIONS else event.keysym
+        if self.animation == self.game_ended:
+            if event.keysym in ("Return", "KP_Enter") or event.char == 'y':
+                self.rematch()
+            elif event.char == 'r':
+                self.restart_same_layout()
+            elif event.keysym == "Escape" or event.char == 'n':
+                quit(self)
+            return
+        if key in KEY_ACTIONS:
+            if not self.controller.is_human:
+                # a bot or remote player chooses the throws
+                return
+            if self.keys.press(event.keycode, key):
+                self.latency.input(KEY_ACTIONS[key])
+            if not self.input_timer:
+                # the first frame of input is now
+                self.input_timer = self.schedule(0, self.read_keys)
+        elif event.keysym == "F5":
+            self.save_game()
+        elif event.keysym == "F9":
+            self.load_game()
+
+    def on_key_released(self, event):
+        self.keys.release(event.keycode)
+
+    def read_keys(self):
+        """Do the actions of keys pressed since the last frame, and of keys
+        that are held, using its own timer with one frame between calls
+        while a key is down.
+        """
+        self.input_timer = None
+        for key in self.keys.frame():
+            if self.animation == self.game_ended or not self.controller.is_human:
+                break
+            if key == '+':
+                self.increase_speed(1)
+            elif key == '-':
+                self.increase_speed(-1)
+            elif key == "Up":
+                self.increase_angle(5)
+            elif key == "Down":
+                self.increase_angle(-5)
+            elif key == ' ':
+                self.throw_banana()
+            elif key == 'v':
+                self.throw_volley()
+        # if the animation is running, the next frame shows the changes
+        if self.stopped():
+            self.latency.frame()
+        if self.keys.waiting():
+            self.input_timer = self.schedule(self.update_delay, self.read_keys)
 
     def on_click(self, event):
-        """Handle mouse click event.  Create an explosion (for testing)."""
-        pass
+        """Handle mouse click event.  A click after a game ends starts a new game."""
+        if self.animation == self.game_ended:
+            self.rematch()
 
     def add_element(self, element):
         """Override GameApp.add_element to keep the monkeys (gorillas) on top
@@ -195,9 +373,13 @@ class GorillaGame(GameApp):
 
     def throw_banana(self):
         """ Throw a banana."""
+        if self.animation in (self.throwing_volley, self.game_ended):
+            return
         if not self.banana.is_moving:
             self.banana.reset()
             self.banana.start()
+            self.record.add_throw(self.player_index, self.banana.angle, self.banana.speed)
+            self.telemetry.emit("throw", self.player_index, self.banana.angle, self.banana.speed)
         # redraw the player images (doesn't seem to work)
         (player.render() for player in self.players)
         self.player.throw()
@@ -206,6 +388,27 @@ class GorillaGame(GameApp):
         # start animation loop
         self.start()
 
+    def throw_volley(self):
+        """Throw a volley of config.VOLLEY_SIZE bananas, at angles spread
+        around the current angle.  All bananas of a volley are moved
+        and drawn by self.projectiles.
+        """
+        if self.projectiles is None or self.animation != self.idle:
+            return
+        banana = self.banana
+        size = config.VOLLEY_SIZE
+        angles = [banana.angle + config.VOLLEY_SPREAD*(k - size//2) for k in range(size)]
+        self.projectiles.launch(banana.start_x, banana.start_y, angles, banana.speed,
+                                banana.x_axis, self.player_index)
+        self.volleys += 1
+        for angle in angles:
+            self.telemetry.emit("throw", self.player_index, angle, banana.speed)
+        self.player.throw()
+        # index of the first gorilla hit by the volley
+        self.volley_target = None
+        self.animation = self.throwing_volley
+        self.start()
+
     ##
     ## Animation actions for different states of the game
     ##
@@ -213,6 +416,10 @@ class GorillaGame(GameApp):
         """Waiting for player to take a turn."""
         pass
 
+    def game_ended(self):
+        """Showing the winner, waiting for the players to play again."""
+        pass
+
     def throwing_banana(self):
         """Banana flies through the air, maybe collides with something."""
         self.banana.update()
@@ -224,8 +431,11 @@ class GorillaGame(GameApp):
         for player in self.players:
             if self.banana.hits(player):
                 log(f"Boom! banana hits {player}")
+                self.telemetry.emit("impact", self.banana.x, self.banana.y,
+                                    self.players.index(player))
                 self.banana.stop()
-                self.explosion = Explosion(self.canvas, self.banana.x, self.banana.y)
+                self.explosion = Explosion(self.canvas, self.banana.x, self.banana.y,
+                                           self.explosion_pool)
                 self.explosion.hits = player
                 # change state
                 self.animation = self.exploding
@@ -236,8 +446,10 @@ class GorillaGame(GameApp):
             if self.banana.hits(bldg) and not self.in_crater(self.banana):
                 # hits a building, but not a hole left by previous explosion
                 log(f"Boom! banana hits {bldg}")
+                self.telemetry.emit("impact", self.banana.x, self.banana.y, -1)
                 self.banana.stop()
-                self.explosion = Explosion(self.canvas, self.banana.x, self.banana.y)
+                self.explosion = Explosion(self.canvas, self.banana.x, self.banana.y,
+                                           self.explosion_pool)
                 self.explosion.hits = bldg
                 # change state
                 self.animation = self.exploding
@@ -247,6 +459,7 @@ class GorillaGame(GameApp):
         # It can keep moving, otherwise it stops when below the screen
         # and changes state to next player's turn.
         if self.banana.is_moving:
+            self.telemetry.emit("banana", self.banana.x, self.banana.y)
             self.message_box.set_text(f"({self.banana.x:.0f},{self.banana.y:.0f})")
         else:
             # Banana stops when it is off the canvas
@@ -255,15 +468,51 @@ class GorillaGame(GameApp):
             self.stop()
             self.next_player()
 
+    def throwing_volley(self):
+        """Bananas of a volley fly through the air, and each banana that
+        hits something explodes.  The turn ends after every banana has
+        landed and every explosion has finished.
+        """
+        for explosion in self.explosions:
+            explosion.update()
+            if not explosion.is_exploding():
+                self.craters.append(explosion.crater())
+        self.explosions = [explosion for explosion in self.explosions
+                           if explosion.is_exploding()]
+        # the thrower moves first, as in throwing_banana
+        self.player.update()
+        players = [(player.x, player.y, player.image_index) for player in self.players]
+        for (x, y, target, _) in self.projectiles.step(self.skyline, players,
+                                                       self.craters):
+            log(f"Boom! volley banana hits {target}")
+            self.telemetry.emit("impact", x, y, target)
+            explosion = Explosion(self.canvas, x, y, self.explosion_pool)
+            if target >= 0:
+                explosion.hits = self.players[target]
+                if self.volley_target is None:
+                    self.volley_target = target
+            self.explosions.append(explosion)
+        self.projectiles.render()
+        if len(self.projectiles) or self.explosions:
+            return
+        self.stop()
+        if self.volley_target is not None:
+            self.game_over(1 - self.volley_target)
+            return
+        self.message_box.set_text("Missed")
+        self.next_player()
+
     def exploding(self):
         """An explosion is occurring."""
         self.explosion.update()
+        self.telemetry.emit("explosion", self.explosion.x, self.explosion.y,
+                            self.explosion.step)
         # give player a chance to update his image, if necessary
         self.player.update()
         if self.explosion.is_exploding():
             return
         # done exploding, change the state
-        self.craters.append(self.explosion)
+        self.craters.append(self.explosion.crater())
         hit_object = self.explosion.hits
         self.stop()
         if isinstance(hit_object, monkey.Monkey):
@@ -272,27 +521,228 @@ class GorillaGame(GameApp):
                 loser = self.players.index(hit_object)
                 winner = 1 - loser
                 self.game_over(winner)
-                # if the method returns, start a new game
-                self.init_game()
                 return
             except ValueError as ex:
                 print(ex)
         self.next_player()
 
     def game_over(self, winner_index: int):
-        """Update scores and ask to play again."""
+        """Update scores and ask to play again, without waiting for the answer."""
         score = self.scores[winner_index]
         score.set(score.get()+1)
+        self.telemetry.emit("game_over", winner_index,
+                            self.scores[0].get(), self.scores[1].get())
+        self.save_record(winner_index)
+        if self.results.enabled:
+            self.results.submit(MatchResult(self.player_names(), winner_index,
+                                            list(self.record.throws)))
         winner = self.players[winner_index]
-        msg = f"{winner} wins!\n\nPlay again?"
-        newgame = messagebox.askyesno("Game Over", msg)
-        if not newgame:
-            quit(self)
+        self.show_game_over(f"{winner} wins!\n\nPlay again?\n"
+                            "Enter or click: yes    Escape: no\n"
+                            "R: again on the same skyline")
+        self.animation = self.game_ended
+        if self.skyline_library is None:
+            self.schedule(0, self.choose_next_layout)
+        if config.AUTO_REMATCH_DELAY and not any(c.is_human for c in self.controllers):
+            # nobody to answer, such as a board of bots in a tournament view
+            self.schedule(config.AUTO_REMATCH_DELAY, self.auto_rematch)
+
+    def player_names(self):
+        """Names of the players in match results: the name of each
+        controller, such as "bot" or the address of a remote player.
+        A human player without a name is asked for it once.
+        """
+        for k, controller in enumerate(self.controllers):
+            if controller.name is None:
+                name = dialog.askstring("Match Results",
+                                        f"Name of the player of {self.players[k]}:",
+                                        parent=self)
+                controller.name = name.strip() if name and name.strip() else f"human {k+1}"
+        return [controller.name for controller in self.controllers]
+
+    def choose_next_layout(self):
+        """Choose a fair layout for the next game while the winner is shown,
+        since testing the fairness of layouts takes a while.
+        """
+        if self.animation == self.game_ended and self.next_layout is None:
+            self.next_layout = BuildingFactory.create_layout(
+                    int(self.canvas['width']), int(self.canvas['height']))
+
+    def show_game_over(self, message):
+        """Show a message on top of the canvas until the next game starts.
+        The canvas items are created for the first game over, and reused.
+        """
+        if not self.game_over_text:
+            width = int(self.canvas['width'])
+            height = int(self.canvas['height'])
+            self.canvas.create_rectangle(width//4, height//3, 3*width//4, 2*height//3,
+                                         fill="black", outline="white", tags=GAME_OVER)
+            self.game_over_text = self.canvas.create_text(width//2, height//2,
+                    fill="white", justify=tk.CENTER, tags=GAME_OVER,
+                    font=font.Font(family="Arial", size=18))
+        self.canvas.itemconfigure(self.game_over_text, text=message)
+        self.canvas.itemconfigure(GAME_OVER, state=tk.NORMAL)
+        self.canvas.tag_raise(GAME_OVER)
+        # show it now, since the animation has stopped
+        self.canvas.flush()
+
+    def auto_rematch(self):
+        """Start a new game, unless it was started already."""
+        if self.animation == self.game_ended:
+            self.rematch()
+
+    def rematch(self):
+        """Start a new game on a new skyline.  Unlike init_game, this keeps
+        the players, bananas, control panel, and pooled canvas items,
+        so only the buildings and craters are deleted and created again.
+        """
+        self.canvas.itemconfigure(GAME_OVER, state=tk.HIDDEN)
+        self.canvas.delete(SKYLINE, CRATER)
+        self.elements = [element for element in self.elements
+                         if not isinstance(element, Building)]
+        self.monitor.new_game(self.canvas)
+        player_buildings = self.create_skyline(next_layout=self.next_layout)
+        self.next_layout = None
+        # draw buildings below the players, bananas, and craters
+        self.canvas.tag_lower(SKYLINE)
+        self.place_players(player_buildings)
+        for player in self.players:
+            player.throw(False)
+            player.update()
+            player.banana.reset()
+            player.banana.hide()
+        self.craters = []
+        if self.projectiles:
+            self.projectiles.clear()
+        self.explosions = []
+        self.volleys = 0
+        self.record = GameRecord.from_game(self)
+        self.next_player()
+        self.initial_state = self.snapshot()
+        self.broadcast.keyframe(self.snapshot())
+        self.canvas.flush()
+
+    def save_record(self, winner_index: int):
+        """Save the record of a finished game in config.REPLAY_DIR,
+        so it can be exported using export.py.
+        """
+        self.record.winner = winner_index
+        # the record doesn't contain volleys, so it can't be replayed
+        if not config.REPLAY_DIR or self.volleys:
+            return
+        os.makedirs(config.REPLAY_DIR, exist_ok=True)
+        # the number keeps games of several boards ending in the same second apart
+        filename = time.strftime("game-%Y%m%d-%H%M%S") + f"-{next(RECORD_NUMBERS)}.json"
+        self.record.save(os.path.join(config.REPLAY_DIR, filename))
+
+    def update_ambience(self):
+        """Change the window lights and the sky, using its own timer
+        so they change even when the animation is stopped.
+        """
+        self.ambience.update(self.canvas)
+        self.schedule(config.AMBIENCE_DELAY, self.update_ambience)
 
     def animate(self):
         self.animation()
+        # send the changes of this frame to Tk
+        self.canvas.flush()
+        if self.broadcast.subscribers:
+            self.broadcast.tick(self.snapshot())
+        self.latency.frame()
         if not self.stopped():
-            self.timer_id = self.after(self.update_delay, self.animate)
+            self.timer_id = self.schedule(self.update_delay, self.animate)
+
+    ##
+    ## Save and restore the state of the game
+    ##
+    def snapshot(self) -> GameState:
+        """Capture the complete state of the game in a GameState.
+        The snapshot shares the skyline with other snapshots of this game.
+        """
+        state = GameState(self.skyline, int(self.canvas['width']),
+                          int(self.canvas['height']))
+        for player, player_state in zip(self.players, state.players):
+            player_state.x = player.x
+            player_state.y = player.y
+            player_state.image_index = player.image_index
+            player_state.is_throwing = player.is_throwing
+            for name in BananaState.__slots__:
+                setattr(player_state.banana, name, getattr(player.banana, name))
+        state.craters = array("f")
+        for crater in self.craters:
+            state.craters.extend((crater.x, crater.y, crater.radius))
+        state.scores = [score.get() for score in self.scores]
+        state.player_index = self.player_index
+        if self.animation == self.throwing_banana:
+            state.phase = THROWING
+        elif self.animation == self.exploding:
+            state.phase = EXPLODING
+            hit_object = self.explosion.hits
+            target = self.players.index(hit_object) if hit_object in self.players else -1
+            state.explosion = ExplosionState(self.explosion.x, self.explosion.y, target)
+            state.explosion.step = self.explosion.step
+        else:
+            state.phase = IDLE
+        return state
+
+    def restore(self, state: GameState):
+        """Restore the game to a state captured by snapshot()."""
+        self.stop()
+        self.init_game(state)
+
+    def restore_state(self, state: GameState):
+        """Set players, bananas, craters, scores, and the animation state
+        from a GameState, after the game objects have been created.
+        """
+        for player, player_state in zip(self.players, state.players):
+            player.move_to(player_state.x, player_state.y)
+            player.image_index = player_state.image_index
+            player.is_throwing = player_state.is_throwing
+            banana = player.banana
+            for name in BananaState.__slots__:
+                setattr(banana, name, getattr(player_state.banana, name))
+            if banana.is_moving:
+                banana.show()
+            banana.render()
+        craters = state.craters
+        for k in range(0, len(craters), 3):
+            (x, y, r) = craters[k:k+3]
+            self.explosion_pool.add_crater(x, y, r)
+            self.craters.append(Crater(x, y, r))
+        for score, value in zip(self.scores, state.scores):
+            score.set(value)
+        # next_player switches players, so start with the other player
+        self.player_index = 1 - state.player_index
+        self.next_player()
+        if state.phase == THROWING:
+            self.animation = self.throwing_banana
+            self.start()
+        elif state.phase == EXPLODING:
+            explosion = state.explosion
+            self.explosion = Explosion(self.canvas, explosion.x, explosion.y,
+                                       self.explosion_pool)
+            if explosion.target >= 0:
+                self.explosion.hits = self.players[explosion.target]
+            while self.explosion.step < explosion.step:
+                self.explosion.update()
+            self.animation = self.exploding
+            self.start()
+
+    def restart_same_layout(self):
+        """Start a new game on the same skyline, keeping the current scores."""
+        state = self.initial_state.clone()
+        state.scores = [score.get() for score in self.scores]
+        self.restore(state)
+
+    def save_game(self, filename=None):
+        """Save the state of the game as JSON."""
+        with open(filename or config.SAVE_FILE, "w") as file:
+            json.dump(self.snapshot().to_dict(), file)
+
+    def load_game(self, filename=None):
+        """Resume a game saved by save_game."""
+        with open(filename or config.SAVE_FILE) as file:
+            self.restore(GameState.from_dict(json.load(file)))
 
     def in_crater(self, element) -> bool:
         """Test if element is inside a crater left by an explosion."""
@@ -310,7 +760,38 @@ class GorillaGame(GameApp):
         self.increase_speed(0)
         self.increase_angle(0)
         self.message_box.set_text(f"{self.player}'s turn")
+        self.telemetry.emit("turn", self.player_index)
         self.animation = self.idle
+        self.controller = self.controllers[self.player_index]
+        if not self.controller.is_human:
+            self.message_box.set_text(f"{self.player} is thinking...")
+            self.decision_id = self.decisions.request(self.controller, self.snapshot(),
+                                                      self.player_index)
+            if not self.decision_timer:
+                self.decision_timer = self.schedule(0, self.wait_for_decision)
+
+    def wait_for_decision(self):
+        """Check if the controller of the current player has chosen a throw,
+        using its own timer so the game can animate while a player is thinking.
+        If the controller failed or took too long, throw using the previous
+        angle and speed.
+        """
+        self.decision_timer = None
+        for (decision_id, throw, error) in self.decisions.poll():
+            if decision_id != self.decision_id or self.animation != self.idle:
+                # for a turn that has ended, or a turn restored while throwing
+                continue
+            self.decision_id = None
+            if error:
+                self.message_box.set_text(f"{self.player}: {error}")
+            else:
+                (self.banana.angle, self.banana.speed) = throw
+                self.increase_speed(0)
+                self.increase_angle(0)
+            self.throw_banana()
+        if self.decisions.waiting():
+            self.decision_timer = self.schedule(config.DECISION_POLL,
+                                                self.wait_for_decision)
 
 
 def log(message): 
@@ -319,6 +800,7 @@ def log(message):
      pass
 
 if __name__ == "__main__":
+    import sys
     root = tk.Tk()
     root.title("Gorilla Game")
  
@@ -326,4 +808,9 @@ if __name__ == "__main__":
     root.resizable(False, False)
     app = GorillaGame(root, config.CANVAS_WIDTH, config.CANVAS_HEIGHT, config.UPDATE_DELAY)
     #app.start()      # this calls animate
-    root.mainloop()
+    if "--asyncio" in sys.argv:
+        # let an asyncio event loop run the game
+        import aioloop
+        aioloop.run(root, app)
+    else:
+        root.mainloop()
@@ -0,0 +1,109 @@
+"""
+Keyboard input that is applied once per frame.
+
+Key events only record which keys are down and which were pressed.
+Once per frame, the game calls frame() to get the keys to act on in that
+frame: each key pressed since the last frame, and keys that are held, which
+repeat after a delay at a rate that increases the longer they are held.
+So the work done for keys is bounded by the frame rate, not the keyboard's
+repeat rate, and the actions depend only on the key events received
+before each frame, so the same events give the same actions.
+
+The keyboard's own repeat events are ignored.  Keys are identified by
+keycode (the physical key), so a key is released even if its character
+changed, such as "+" when Shift is released first.  On X11 a repeat
+is a release and a press, so a key released and pressed again before
+the next frame is still held.
+"""
+import game_constants as config
+
+
+class HeldKey:
+    """A key that is down.
+
+    time is the milliseconds it has been held, in frames, and next_repeat
+    is the time of its next repeat.
+    """
+    __slots__ = ("key", "pressed", "released", "time", "next_repeat", "interval")
+
+    def __init__(self, key, delay, interval):
+        self.key = key
+        # pressed and not yet seen by frame()
+        self.pressed = True
+        # released, but maybe pressed again before the next frame
+        self.released = False
+        self.time = 0
+        self.next_repeat = delay
+        self.interval = interval
+
+
+class KeyInput:
+    """Keys that are down, and key presses waiting for the next frame.
+
+    Arguments:
+        frame_time - milliseconds between frames
+        repeating - keys that repeat while held; other keys act once per press
+        delay - milliseconds a key is held before it repeats
+        interval - milliseconds between the first two repeats
+        acceleration - each interval between repeats is this times the
+                       previous one, but at least one frame
+    """
+
+    def __init__(self, frame_time, repeating=(), delay=config.KEY_REPEAT_DELAY,
+                 interval=config.KEY_REPEAT_INTERVAL,
+                 acceleration=config.KEY_REPEAT_ACCELERATION):
+        self.frame_time = frame_time
+        self.repeating = set(repeating)
+        self.delay = delay
+        self.interval = interval
+        self.acceleration = acceleration
+        # keycode -> HeldKey, for keys that are down
+        self.keys = {}
+
+    def press(self, keycode, key) -> bool:
+        """Key (a char or keysym) was pressed.
+        Returns True if it is a new press, not a repeat.
+        """
+        held = self.keys.get(keycode)
+        if held:
+            held.released = False
+            return False
+        self.keys[keycode] = HeldKey(key, self.delay, self.interval)
+        return True
+
+    def release(self, keycode):
+        """The key was released.  It is forgotten after the next frame,
+        so a press and release between frames still acts once.
+        """
+        held = self.keys.get(keycode)
+        if held:
+            held.released = True
+
+    def clear(self):
+        """Forget all keys, such as when the window loses the focus
+        and key releases aren't received.
+        """
+        self.keys.clear()
+
+    def waiting(self) -> bool:
+        """Test if any key is down or waiting for the next frame."""
+        return bool(self.keys)
+
+    def frame(self) -> list:
+        """Advance one frame.  Returns the keys to act on in this frame,
+        in the order they were pressed.
+        """
+        keys = []
+        for keycode, held in list(self.keys.items()):
+            if held.pressed:
+                held.pressed = False
+                keys.append(held.key)
+            elif held.key in self.repeating:
+                held.time += self.frame_time
+                if held.time >= held.next_repeat:
+                    keys.append(held.key)
+                    held.next_repeat += held.interval
+                    held.interval = max(self.frame_time, held.interval*self.acceleration)
+            if held.released:
+                del self.keys[keycode]
+        return keys
@@ -0,0 +1,117 @@
+"""
+Measure the time from a key press until its effect is drawn on the screen.
+
+The game calls input(action) when it receives a key event, and frame()
+after it has made the changes for a frame (or for an input, when the
+animation isn't running).  Tk draws changes when it is idle, so the time
+an input reaches the screen is measured by an idle callback that is
+scheduled after the idle callbacks that draw the frame.
+
+For each action, such as "throw" or "angle", two times are recorded:
+    frame  - from the key event until the changes were made, which
+             includes waiting for the animation timer
+    screen - from the key event until the changes were drawn
+"""
+import atexit
+import statistics
+import time
+from collections import deque
+
+# Maximum number of times kept for each action
+HISTORY = 10000
+
+
+class LatencyTracer:
+    """Record the latency of inputs, by action.
+
+    Arguments:
+        widget - any Tk widget, used to schedule idle callbacks
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        # (action, time of input) waiting for the next frame
+        self._pending = []
+        # (action, time of input, time of frame) waiting to be drawn
+        self._drawing = []
+        self._idle_id = None
+        # action -> deque of (frame, screen) latency in seconds
+        self.latencies = {}
+
+    def input(self, action):
+        """An input for action was received."""
+        self._pending.append((action, time.perf_counter()))
+
+    def frame(self):
+        """The changes for a frame have been made, including the changes
+        for the inputs received so far.  They will be drawn when Tk is idle.
+        """
+        if not self._pending:
+            return
+        now = time.perf_counter()
+        self._drawing.extend((action, start, now) for (action, start) in self._pending)
+        self._pending.clear()
+        if not self._idle_id:
+            # The first idle callback runs with the callbacks that draw the
+            # changes. Callbacks scheduled by it run after the drawing is done.
+            self._idle_id = self.widget.after_idle(
+                    lambda: self.widget.after_idle(self._drawn))
+
+    def _drawn(self):
+        now = time.perf_counter()
+        for (action, start, frame) in self._drawing:
+            if action not in self.latencies:
+                self.latencies[action] = deque(maxlen=HISTORY)
+            self.latencies[action].append((frame - start, now - start))
+        self._drawing.clear()
+        self._idle_id = None
+
+    def summary(self) -> dict:
+        """Return {action: {stage: (median, 90th percentile, max)}} in
+        milliseconds, where stage is "frame" or "screen".
+        """
+        result = {}
+        for action, times in self.latencies.items():
+            result[action] = {}
+            for stage, values in zip(("frame", "screen"), zip(*times)):
+                values = sorted(1000*value for value in values)
+                p90 = values[min(len(values) - 1, int(0.9*len(values)))]
+                result[action][stage] = (statistics.median(values), p90, values[-1])
+        return result
+
+    def report(self) -> str:
+        """Describe the latency of each action."""
+        lines = [f"{'action':10s} {'count':>6s}  {'stage':6s} "
+                 f"{'median':>7s} {'p90':>7s} {'max':>7s}  (ms)"]
+        for action, stages in sorted(self.summary().items()):
+            # show the action and count only on its first line
+            label = f"{action:10s} {len(self.latencies[action]):6d}"
+            for stage, (median, p90, maximum) in stages.items():
+                lines.append(f"{label}  {stage:6s} "
+                             f"{median:7.1f} {p90:7.1f} {maximum:7.1f}")
+                label = " "*17
+        return "\n".join(lines)
+
+
+class NullLatencyTracer:
+    """A LatencyTracer that doesn't record anything."""
+
+    def input(self, action):
+        pass
+
+    def frame(self):
+        pass
+
+    def report(self) -> str:
+        return "Latency tracing is disabled"
+
+
+def open_tracer(enabled, widget):
+    """Return a LatencyTracer that prints its report when the program
+    exits, or a NullLatencyTracer if not enabled.
+    """
+    if not enabled:
+        return NullLatencyTracer()
+    tracer = LatencyTracer(widget)
+    atexit.register(lambda: print(tracer.report()))
+    return tracer
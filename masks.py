@@ -0,0 +1,102 @@
+"""
+Collision masks made from the alpha channel of images, for testing
+whether two sprites touch, pixel by pixel.
+
+A mask is packed as one Python int per row of the image, where bit k is
+set if pixel k of the row is solid.  Two masks overlap if a row of one,
+shifted to the position of the other image, has a bit in common with
+the row of the other (row1 & row2).  The bounding box of the solid
+pixels is tested first, so sprites that are apart cost only a few
+comparisons, and only the rows where the boxes overlap are tested.
+
+For arrays of positions (see fairness.py), overlap_table() computes once
+whether the masks overlap at every offset where their images overlap.
+"""
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ModuleNotFoundError:
+    HAS_NUMPY = False
+
+# Pixels having at least this alpha (0 to 255) are solid
+ALPHA_THRESHOLD = 128
+
+
+class CollisionMask:
+    """The solid pixels of an image (a PIL Image).
+
+    Positions are relative to the top left corner of the image.
+    left, top, right and bottom are the bounding box of the solid
+    pixels, where right and bottom are not included.
+    """
+    __slots__ = ("width", "height", "rows", "left", "top", "right", "bottom", "_tables")
+
+    def __init__(self, image, threshold=ALPHA_THRESHOLD):
+        (self.width, self.height) = image.size
+        alpha = image.convert("RGBA").getchannel("A").tobytes()
+        self.rows = []
+        for y in range(self.height):
+            pixels = alpha[y*self.width:(y+1)*self.width]
+            # bit k of the row is pixel k, so reverse the pixels
+            bits = "".join("1" if value >= threshold else "0" for value in reversed(pixels))
+            self.rows.append(int(bits, 2))
+        solid = [y for y, row in enumerate(self.rows) if row]
+        if solid:
+            self.top = solid[0]
+            self.bottom = solid[-1] + 1
+            columns = 0
+            for row in self.rows:
+                columns |= row
+            # lowest and highest set bits
+            self.left = (columns & -columns).bit_length() - 1
+            self.right = columns.bit_length()
+        else:
+            (self.left, self.top, self.right, self.bottom) = (0, 0, 0, 0)
+        self._tables = {}
+
+    def contains(self, x, y) -> bool:
+        """Test if pixel (x,y) is solid, where x and y are ints."""
+        return (self.left <= x < self.right and self.top <= y < self.bottom
+                and self.rows[y] >> x & 1 == 1)
+
+    def overlaps(self, other, dx, dy) -> bool:
+        """Test if a solid pixel of other mask, with its top left corner
+        at (dx,dy) in this mask, is on a solid pixel of this mask.
+        dx and dy are ints.
+        """
+        top = max(self.top, other.top + dy)
+        bottom = min(self.bottom, other.bottom + dy)
+        if top >= bottom:
+            return False
+        if max(self.left, other.left + dx) >= min(self.right, other.right + dx):
+            return False
+        rows = self.rows
+        other_rows = other.rows
+        for y in range(top, bottom):
+            row = other_rows[y - dy]
+            if rows[y] & (row << dx if dx >= 0 else row >> -dx):
+                return True
+        return False
+
+    def overlap_table(self, other):
+        """Return a numpy array of bool, where table[dy + other.height - 1,
+        dx + other.width - 1] is self.overlaps(other, dx, dy), for every
+        offset where the images overlap.  The table is computed once.
+        """
+        key = id(other)
+        if key not in self._tables:
+            solid = self.to_array()
+            table = np.zeros((self.height + other.height - 1,
+                              self.width + other.width - 1), dtype=bool)
+            # this mask, shifted by each solid pixel of other
+            for (y, x) in zip(*np.nonzero(other.to_array())):
+                top = other.height - 1 - y
+                left = other.width - 1 - x
+                table[top:top + self.height, left:left + self.width] |= solid
+            self._tables[key] = (other, table)
+        return self._tables[key][1]
+
+    def to_array(self):
+        """Return the mask as a numpy array of bool, indexed by [y, x]."""
+        return np.array([[row >> x & 1 for x in range(self.width)] for row in self.rows],
+                        dtype=bool).reshape(self.height, self.width)
@@ -0,0 +1,134 @@
+"""
+Watch for canvas items, game elements, and memory that grow from game
+to game, which make long sessions slower and slower.
+
+At the end of each game, when its buildings and craters have been
+deleted but before the canvas is cleared for a new game, LeakMonitor
+counts the canvas items that are left, by type and by tag, the GameCanvasElement objects
+that are still alive, and (optionally) the memory allocated by Python.
+If a count grows by more than a limit per game, averaged over several
+games, it issues a LeakWarning.
+
+Some counts vary from game to game, such as the elements of the last game
+that are still referenced, so growth is measured using the smallest count
+in each window of WINDOW games, which only increases if something is
+never deleted.
+"""
+import gc
+import tracemalloc
+import warnings
+from collections import Counter
+from gamelib import GameCanvasElement
+
+# Number of games in each window used to measure growth
+WINDOW = 5
+
+
+class LeakWarning(RuntimeWarning):
+    """Something grows in each game, such as canvas items or memory."""
+
+
+class Sample:
+    """Counts of canvas items, game elements, and memory at one time."""
+    __slots__ = ("items", "types", "tags", "elements", "memory")
+
+    def __init__(self, canvas, trace_memory=False):
+        items = canvas.find_all()
+        self.items = len(items)
+        self.types = Counter(canvas.type(item) for item in items)
+        self.tags = Counter(tag for item in items for tag in canvas.gettags(item))
+        # count only elements that are really in use
+        gc.collect()
+        self.elements = len(GameCanvasElement.instances)
+        self.memory = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+
+    def __str__(self):
+        types = ", ".join(f"{name} {count}" for name, count in self.types.most_common())
+        return (f"{self.items} canvas items ({types}), "
+                f"{self.elements} elements, {self.memory//1024} KB")
+
+
+class LeakMonitor:
+    """Sample the canvas and memory at the end of each game, and warn
+    when they grow by more than a limit per game.
+
+    Arguments:
+        item_limit - maximum growth in canvas items (total, or of one
+                     type or tag) or game elements per game
+        memory_limit - maximum growth in Python memory per game, in bytes.
+                     If not None, memory is traced using tracemalloc,
+                     which makes the game slower.
+    """
+
+    def __init__(self, item_limit=5, memory_limit=None):
+        self.item_limit = item_limit
+        self.memory_limit = memory_limit
+        self.trace_memory = memory_limit is not None
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # a Sample for each game
+        self.samples = []
+        self.warnings = 0
+
+    def new_game(self, canvas):
+        """Sample the canvas at the end of a game, after the items that
+        are replaced by the new game are deleted, and check for growth.
+        """
+        self.samples.append(Sample(canvas, self.trace_memory))
+        if len(self.samples) >= 2*WINDOW:
+            for message in self.growth():
+                self.warnings += 1
+                warnings.warn(message, LeakWarning, stacklevel=2)
+
+    def growth(self):
+        """Return a message for each count that grew by more than
+        its limit per game over the last 2*WINDOW games.
+        """
+        previous = self.samples[-2*WINDOW:-WINDOW]
+        recent = self.samples[-WINDOW:]
+
+        def per_game(count):
+            """Growth of the smallest count in each window, per game."""
+            return (min(map(count, recent)) - min(map(count, previous)))/WINDOW
+
+        messages = []
+        checks = [("canvas items", lambda sample: sample.items),
+                  ("game elements", lambda sample: sample.elements)]
+        checks += [(f"{name} items", lambda sample, name=name: sample.types[name])
+                   for name in sorted(recent[-1].types)]
+        checks += [(f"items tagged '{tag}'", lambda sample, tag=tag: sample.tags[tag])
+                   for tag in sorted(recent[-1].tags)]
+        for (what, count) in checks:
+            growth = per_game(count)
+            if growth > self.item_limit:
+                messages.append(f"{what} grow by {growth:.0f} per game")
+        if self.trace_memory:
+            growth = per_game(lambda sample: sample.memory)
+            if growth > self.memory_limit:
+                messages.append(f"memory grows by {growth/1024:.0f} KB per game")
+        return messages
+
+    def report(self) -> str:
+        """Describe the first and latest samples."""
+        if not self.samples:
+            return "No games sampled"
+        return (f"{len(self.samples)} games. First: {self.samples[0]}\n"
+                f"Latest: {self.samples[-1]}")
+
+
+class NullMonitor:
+    """A LeakMonitor that doesn't sample anything."""
+    warnings = 0
+
+    def new_game(self, canvas):
+        pass
+
+    def report(self) -> str:
+        return "Leak monitor is disabled"
+
+
+def open_monitor(enabled, item_limit=5, memory_limit=None):
+    """Return a LeakMonitor, or a NullMonitor if not enabled."""
+    if not enabled:
+        return NullMonitor()
+    return LeakMonitor(item_limit, memory_limit)
@@ -1,3 +1,4 @@
+import math
 import tkinter as tk
 try:
     from PIL import Image
@@ -9,6 +10,7 @@ except ModuleNotFoundError:
 from gamelib import Sprite
 import game_constants as config
 from banana import Banana
+from masks import CollisionMask
 
 # show the bounding box around monkey image, for development
 SHOW_BOUNDING_BOX = False
@@ -27,15 +29,42 @@ class Monkey(Sprite):
         banana_x = x
         banana_y = y - self.height - 10  # 10 pixels above monkey
         self._banana = Banana(canvas, 'images/banana.png', banana_x, banana_y)
-        # images for animating throw
-        image1 = Image.open(image_filename)
-        image2 = Image.open(MONKEY_ARM_RAISED_IMAGE)
-        self.images = [image1,
-                       image2,
-                       image2
-                      ]
+        # images for animating throw, shared by all monkeys
+        self.images = Monkey.throw_images(image_filename)
         self.image_index = 0
         self.is_throwing = False
+        self.masks = Monkey.image_masks(image_filename)
+
+    # collision masks of the images for each (image file, direction)
+    _masks = {}
+
+    @staticmethod
+    def load_images(image_filename, x_axis=1):
+        """Return the PIL images of a throw: normal, arm raised, arm raised.
+        If x_axis is -1, the arm raised images are flipped as in set_x_axis.
+        """
+        images = [Image.open(image_filename)] + [Image.open(MONKEY_ARM_RAISED_IMAGE)]*2
+        if x_axis == -1:
+            images[1:] = [image.transpose(Image.FLIP_LEFT_RIGHT) for image in images[1:]]
+        return images
+
+    @staticmethod
+    def throw_images(image_filename, x_axis=1):
+        """Return a PhotoImage for each image of a throw, shared by all monkeys."""
+        return Sprite.shared_images(("throw", image_filename, x_axis),
+                                    lambda: Monkey.load_images(image_filename, x_axis))
+
+    @classmethod
+    def image_masks(cls, image_filename, x_axis=1):
+        """Return a CollisionMask for each image of a throw, as in self.images.
+        If x_axis is -1, the images are flipped as in set_x_axis.
+        The masks are shared by all monkeys.
+        """
+        key = (image_filename, x_axis)
+        if key not in cls._masks:
+            cls._masks[key] = [CollisionMask(image)
+                               for image in Monkey.load_images(image_filename, x_axis)]
+        return cls._masks[key]
 
     def init_element(self):
         # Adjust y for height of image so that y is at bottom of image
@@ -56,10 +85,9 @@ class Monkey(Sprite):
                     -1 or tk.LEFT if banana is thrown to the left.
         """
         if direction == tk.LEFT or direction == -1:
-            # flip images of monkey throwing banana
-            # replace images
-            for k in range(1,len(self.images)):
-                self.images[k] = self.images[k].transpose(Image.FLIP_LEFT_RIGHT)
+            # use flipped images of monkey throwing banana
+            self.images = Monkey.throw_images(self.image_filename, -1)
+            self.masks = Monkey.image_masks(self.image_filename, -1)
         elif direction == tk.RIGHT or direction == 1:
             # no change needed
             pass
@@ -70,24 +98,19 @@ class Monkey(Sprite):
         self.banana.set_x_axis(direction)
 
     def contains(self, x, y):
-        """The point x,y is contained in the monkey's image if it
-        hits any part of the image.  Exclude empty space at corners.
+        """The point x,y is contained in the monkey if it is on a solid
+        (not transparent) pixel of the monkey's current image.
+        """
+        (left, top) = self.mask_origin()
+        return self.masks[self.image_index].contains(math.floor(x) - left,
+                                                     math.floor(y) - top)
+
+    def mask_origin(self):
+        """Position of the top left corner of the image, which has
+        (x,y) at the center of its bottom edge, as ints.
         """
-        w = self.width
-        h = self.height
-        # More reliable to use canvas.bbox(self.canvas_object_id)
-        # instead of relying on our own notion of image location.
-        (xl, yl, xr, yr) = self.canvas.bbox(self.canvas_object_id)
-        dx = abs(x - (xl+xr)/2)
-        dy = abs(y - (yl+yr)/2)
-        # Use >= or > here?  dx >= w/2 is a most restrictive test
-        # of collision, so banana will need to be a bit closer to monkey.
-        if dx >= w/2: return False
-        if dy >= h/2: return False
-        # Exclude the 4 corners of bounding box of the image
-        # This is empty space not occupied by the monkey image
-        if dx >= w/4 and dy >= h/4: return False
-        return True
+        mask = self.masks[self.image_index]
+        return (math.floor(self.x) - mask.width//2, math.floor(self.y) - mask.height)
 
     def move_to(self, x, y):
         """Move the player's image to canvas (x,y).
@@ -99,10 +122,12 @@ class Monkey(Sprite):
         self.canvas.move(self.canvas_object_id, dx, dy)
         self.x = x
         self.y = y
+        self.rendered_at = (x, y)
         # move the banana too, of course.
         self.canvas.move(self.banana.canvas_object_id, dx, dy)
         self.banana.start_x += dx
         self.banana.start_y += dy
+        self.banana.invalidate()
 
     @property
     def name(self):
@@ -129,16 +154,16 @@ class Monkey(Sprite):
         if self.is_throwing:
             # animate the throwing motion
             self.image_index = (self.image_index+1) % len(self.images)
-            # paste function provided by ImageTk.PhotoImage class,
-            # but it is "very slow" according to docs
-            self.image.paste(self.images[self.image_index])
+            # show the next image, instead of pasting it into our PhotoImage
+            # (paste is "very slow" according to docs)
+            self.show_image(self.images[self.image_index])
             if self.image_index == 0:
                 # done throwing motion
                 self.is_throwing = False
         elif self.image_index > 0:
             # revert to normal image
             self.image_index = 0
-            self.image.paste(self.images[self.image_index])
+            self.show_image(self.images[self.image_index])
     
     def __str__(self):
         return f"{self._name}"
@@ -0,0 +1,183 @@
+"""
+Many bananas in flight at the same time, such as a volley of throws.
+
+ProjectileManager keeps the position and velocity of every banana in
+flight in numpy arrays.  Each time step moves all the bananas and tests
+all of them for collisions with gorillas, buildings, and craters using
+array operations (the same tests as state.GameState and fairness.py),
+so the cost of a time step doesn't grow by a Python method call per banana.
+
+The bananas are drawn using a fixed pool of canvas image items, one for
+each slot in the arrays, that are created with the manager.  All the
+items are moved and their images changed by one Tcl script per frame.
+
+numpy is needed. If it is not installed, HAS_NUMPY is False.
+"""
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ModuleNotFoundError:
+    HAS_NUMPY = False
+import tkinter as tk
+from banana import Banana
+from fairness import gorilla_hits
+from state import BANANA_WIDTH, BANANA_HEIGHT
+import game_constants as config
+
+# A tag used to identify the pooled canvas items of bananas in flight
+PROJECTILE = "projectile"
+
+
+class ProjectileManager:
+    """Bananas in flight, stored in arrays with one slot per banana.
+
+    Slot k is drawn using canvas item items[k].  A slot is free when
+    active[k] is False, and at most capacity bananas can be in flight.
+    """
+
+    def __init__(self, canvas, image_filename, capacity=config.MAX_PROJECTILES):
+        self.canvas = canvas
+        self.capacity = capacity
+        self.width = int(canvas['width'])
+        self.height = int(canvas['height'])
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        # direction of the x-axis (1 or -1), to spin each banana the right way
+        self.x_axis = np.ones(capacity, dtype=np.int8)
+        # index of the player who threw each banana
+        self.owner = np.zeros(capacity, dtype=np.int8)
+        self.image_index = np.zeros(capacity, dtype=np.int8)
+        self.active = np.zeros(capacity, dtype=bool)
+        # slots of bananas that stopped and whose items must be hidden
+        self._hide = []
+        # crater (x, y, radius) arrays, rebuilt when craters are added
+        # or the game uses a new list of craters
+        self._craters = None
+        self._crater_list = None
+        self._crater_count = -1
+        self.images = Banana.spin_images(image_filename)
+        self._image_names = [str(image) for image in self.images]
+        self.items = [canvas.create_image(0, 0, image=self.images[0],
+                                          state=tk.HIDDEN, tags=PROJECTILE)
+                      for _ in range(capacity)]
+        self._canvas_name = str(canvas)
+
+    def __len__(self):
+        """Number of bananas in flight."""
+        return int(np.count_nonzero(self.active))
+
+    def launch(self, x, y, angles, speeds, x_axis, owner) -> int:
+        """Throw bananas from (x,y), one for each angle in degrees.
+        speeds is one speed for all bananas or a speed for each banana.
+        Bananas that don't fit in a free slot are not thrown.
+        Returns the number of bananas thrown.
+        """
+        angles = np.radians(np.asarray(angles, dtype=float))
+        speeds = np.broadcast_to(np.asarray(speeds, dtype=float), angles.shape)
+        slots = np.flatnonzero(~self.active)[:angles.size]
+        count = slots.size
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vx[slots] = np.cos(angles[:count])*speeds[:count]*x_axis
+        self.vy[slots] = np.sin(angles[:count])*speeds[:count]
+        self.x_axis[slots] = x_axis
+        self.owner[slots] = owner
+        self.image_index[slots] = 0
+        self.active[slots] = True
+        # slots reused before they were hidden don't need to be hidden
+        self._hide = [k for k in self._hide if not self.active[k]]
+        return count
+
+    def clear(self):
+        """Remove all bananas in flight."""
+        self._hide.extend(np.flatnonzero(self.active).tolist())
+        self.active[:] = False
+        self._crater_list = None
+        self._crater_count = -1
+
+    def step(self, skyline, players, craters=()):
+        """Move every banana one time step, as in Banana.update,
+        and test for collisions, as in GorillaGame.throwing_banana.
+
+        Arguments:
+            skyline - the state.Skyline of the game
+            players - (x, y, image_index) of each gorilla, where y is the
+                      bottom of its image.  Gorilla 0 faces right, 1 faces left.
+            craters - the Craters left by explosions, that bananas pass through
+        Returns:
+            a list of (x, y, target, owner) for each banana that hit something,
+            where target is the index of the gorilla hit or -1 for a building
+        """
+        slots = np.flatnonzero(self.active)
+        if not slots.size:
+            return []
+        x = self.x[slots] + self.vx[slots]
+        y = self.y[slots] - self.vy[slots]
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vy[slots] -= config.GRAVITY
+        self.image_index[slots] = (self.image_index[slots] - self.x_axis[slots]) \
+                                  % len(self.images)
+        # gorillas are tested in order, so a banana hits at most one gorilla
+        target = np.full(slots.size, -2, dtype=np.int8)
+        for k, (gx, gy, frame) in enumerate(players):
+            hit = gorilla_hits((gx, gy), 1 if k == 0 else -1, frame,
+                               x, y, self.image_index[slots])
+            target[hit & (target == -2)] = k
+        # the 5 points of each banana tested for collision with buildings, shape (n, 5)
+        r = min(BANANA_WIDTH, BANANA_HEIGHT)
+        px = x[:, None] + np.array([0, r, -r, 0, 0], dtype=float)
+        py = y[:, None] + np.array([0, 0, 0, -r, r], dtype=float)
+        # buildings, except where the banana is in a crater
+        lefts = np.asarray(skyline.xs, dtype=float)
+        rights = lefts + np.asarray(skyline.widths, dtype=float)
+        tops = skyline.baseline - np.asarray(skyline.heights, dtype=float)
+        k = np.clip(np.searchsorted(lefts, px, side="right") - 1, 0, len(lefts) - 1)
+        hit = ((lefts[k] < px) & (px < rights[k])
+               & (tops[k] < py) & (py < skyline.baseline)).any(axis=1)
+        hit &= ~self._in_crater(x, y, craters)
+        target[hit & (target == -2)] = -1
+        # a banana that left the canvas stops without hitting anything
+        moving = (y <= self.height) & (x >= 0) & (x <= self.width)
+        target[~moving] = -2
+        hits = np.flatnonzero(target != -2)
+        gone = ~moving | (target != -2)
+        stopped = slots[gone]
+        self.active[stopped] = False
+        self._hide.extend(stopped.tolist())
+        owner = self.owner[slots]
+        return [(float(x[n]), float(y[n]), int(target[n]), int(owner[n])) for n in hits]
+
+    def _in_crater(self, x, y, craters):
+        """Test whether each point (x,y) is in a crater."""
+        if craters is not self._crater_list or len(craters) != self._crater_count:
+            self._crater_list = craters
+            self._crater_count = len(craters)
+            self._craters = np.array([(crater.x, crater.y, crater.radius)
+                                      for crater in craters], dtype=float).reshape(-1, 3)
+        if not self._crater_count:
+            return np.zeros(x.shape, dtype=bool)
+        (cx, cy, cr) = self._craters.T
+        return (np.hypot(x[:, None] - cx, y[:, None] - cy) <= cr).any(axis=1)
+
+    def render(self):
+        """Draw all the bananas in flight, and hide bananas that stopped.
+        The commands are added to the canvas's buffer (see
+        gamelib.BufferedCanvas), and sent with the rest of the frame.
+        """
+        canvas = self._canvas_name
+        names = self._image_names
+        items = self.items
+        hidden = self._hide
+        commands = [f"{canvas} itemconfigure {items[k]} -state hidden"
+                    for k in hidden]
+        self._hide = []
+        slots = np.flatnonzero(self.active).tolist()
+        commands.extend(f"{canvas} coords {items[k]} {x:.1f} {y:.1f}\n"
+                        f"{canvas} itemconfigure {items[k]} -image {names[n]} -state normal"
+                        for (k, x, y, n) in zip(slots, self.x[slots].tolist(),
+                                                self.y[slots].tolist(),
+                                                self.image_index[slots].tolist()))
+        self.canvas.script(commands, [items[k] for k in hidden + slots])
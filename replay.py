@@ -0,0 +1,178 @@
+"""
+Record a game and replay it without a window.
+
+A GameRecord holds only plain data (the skyline, where the gorillas
+stand, and the speed and angle of each throw), so it can be saved as
+JSON when a game ends and replayed later by ReplaySimulation, which
+repeats the motion of bananas and explosions one animation frame at a time.
+"""
+import json
+from explosion import Explosion
+from building import BLDG_COLORS
+from state import GameState, Skyline, IDLE, THROWING, EXPLODING
+import game_constants as config
+
+BANANA_IMAGE = "images/banana.png"
+MONKEY_IMAGE = "images/monkey.png"
+MONKEY_ARM_RAISED_IMAGE = "images/monkey-arm-raised.png"
+# Number of frames to pause between turns in a replay
+TURN_PAUSE_FRAMES = 10
+
+
+class GameRecord:
+    """The layout of one game and the throws made by the players.
+
+    buildings = list of (x, y, width, height, color, windows) where x is
+                the left edge, y is the baseline, and windows is a list
+                of (x, y, color) for each window.
+    players = list of (x, y) of each gorilla, y is the bottom of the image.
+    throws = list of (player_index, angle, speed) in the order thrown.
+    winner = index of the winning player, or None if game not finished.
+    """
+
+    def __init__(self, width=config.CANVAS_WIDTH, height=config.CANVAS_HEIGHT,
+                 background=config.CANVAS_COLOR):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.buildings = []
+        self.players = []
+        self.throws = []
+        self.winner = None
+
+    @classmethod
+    def from_game(cls, game):
+        """Create a record of the current layout of a GorillaGame."""
+        record = cls(int(game.canvas['width']), int(game.canvas['height']),
+                     game.canvas['bg'])
+        for bldg in game.buildings:
+            record.buildings.append((bldg.x, bldg.y, bldg.width, bldg.height,
+                                     bldg.color, list(bldg.windows)))
+        for player in game.players:
+            record.players.append((player.x, player.y))
+        return record
+
+    def add_throw(self, player_index, angle, speed):
+        """Record a banana toss by a player."""
+        self.throws.append((player_index, angle, speed))
+
+    def to_dict(self) -> dict:
+        return {"width": self.width,
+                "height": self.height,
+                "background": self.background,
+                "buildings": self.buildings,
+                "players": self.players,
+                "throws": self.throws,
+                "winner": self.winner
+                }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        record = cls(data["width"], data["height"], data["background"])
+        record.buildings = [(x, y, w, h, color, [tuple(win) for win in windows])
+                            for (x, y, w, h, color, windows) in data["buildings"]]
+        record.players = [tuple(p) for p in data["players"]]
+        record.throws = [tuple(t) for t in data["throws"]]
+        record.winner = data.get("winner")
+        return record
+
+    def save(self, filename):
+        """Save the record as JSON."""
+        with open(filename, "w") as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a record saved by save()."""
+        with open(filename) as file:
+            return cls.from_dict(json.load(file))
+
+
+class Frame:
+    """What is visible in one animation frame of a replay.
+
+    banana = (x, y, image_index) of a flying banana, or None
+    explosion = (x, y, color, radius) of the fireball, or None
+    crater = (x, y, radius) of a crater that first appears in this frame, or None
+    player_images = image index of each gorilla (0 = arms down)
+    message = text shown in the upper left corner
+    """
+    __slots__ = ("banana", "explosion", "crater", "player_images", "message")
+
+    def __init__(self, banana, explosion, crater, player_images, message):
+        self.banana = banana
+        self.explosion = explosion
+        self.crater = crater
+        self.player_images = player_images
+        self.message = message
+
+
+class ReplaySimulation:
+    """Repeat the motion of a recorded game one frame at a time,
+    using a GameState to play the recorded throws.
+    """
+
+    def __init__(self, record: GameRecord):
+        self.record = record
+        skyline = Skyline(record.height,
+                          [(x, width, height, color_index(color))
+                           for (x, _, width, height, color, _) in record.buildings])
+        self.game = GameState(skyline, record.width, record.height)
+        self.explosion_frames = Explosion.frame_sequence()
+        for k, (x, y) in enumerate(record.players):
+            self.game.players[k].move_to(x, y)
+
+    def frames(self):
+        """Generate a Frame for each animation step of the replay."""
+        game = self.game
+        for (player_index, angle, speed) in self.record.throws:
+            game.player_index = player_index
+            message = f"Gorilla {player_index+1}'s turn"
+            for _ in range(TURN_PAUSE_FRAMES):
+                yield self.frame(message)
+            game.throw(angle, speed)
+            yield from self.throw()
+        winner = self.record.winner
+        if winner is not None:
+            message = f"Gorilla {winner+1} wins!"
+            for _ in range(2*TURN_PAUSE_FRAMES):
+                yield self.frame(message)
+
+    def throw(self):
+        """Generate the frames for one throw, until the banana misses
+        or the explosion ends.
+        """
+        game = self.game
+        # the player who threw, since the game changes players after a miss
+        banana = game.player.banana
+        exploded = False
+        while game.phase != IDLE:
+            game.step()
+            explosion = game.explosion
+            if game.phase == THROWING:
+                yield self.frame(f"({banana.x:.0f},{banana.y:.0f})",
+                                 banana=(banana.x, banana.y, banana.image_index))
+            elif game.phase == EXPLODING:
+                exploded = True
+                (color, radius) = self.explosion_frames[explosion.step]
+                crater = None
+                if explosion.step == Explosion.STEPS:
+                    crater = (explosion.x, explosion.y, Explosion.crater_radius())
+                if explosion.target >= 0:
+                    message = f"Boom! Gorilla {explosion.target+1} is hit"
+                else:
+                    message = "Boom!"
+                yield self.frame(message, explosion=(explosion.x, explosion.y, color, radius),
+                                 crater=crater)
+            else:
+                # the banana left the canvas or the explosion is over
+                yield self.frame("" if exploded else "Missed")
+
+    def frame(self, message, banana=None, explosion=None, crater=None):
+        player_images = [player.image_index for player in self.game.players]
+        return Frame(banana, explosion, crater, player_images, message)
+
+
+def color_index(color):
+    """Index of a building color in BLDG_COLORS, 0 if not found."""
+    return BLDG_COLORS.index(color) if color in BLDG_COLORS else 0
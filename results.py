@@ -0,0 +1,278 @@
+"""
+A local SQLite database of players, matches, throws, and Elo ratings.
+
+ResultsStore writes matches in batches, each batch in one transaction,
+so simulations can record hundreds of thousands of matches quickly.
+ResultsWriter owns a ResultsStore in a background thread, so the game
+can record a match without waiting for the disk.
+
+Run this file to show the leaderboard:
+
+    python3 results.py gorilla-results.db
+"""
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rating of a new player, and the maximum change in rating per match
+INITIAL_RATING = 1500.0
+ELO_K = 32
+# Maximum number of matches written in one transaction by ResultsWriter
+BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id      INTEGER PRIMARY KEY,
+    name    TEXT NOT NULL UNIQUE,
+    rating  REAL NOT NULL,
+    matches INTEGER NOT NULL DEFAULT 0,
+    wins    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS matches (
+    id        INTEGER PRIMARY KEY,
+    played_at REAL NOT NULL,
+    player0   INTEGER NOT NULL REFERENCES players(id),
+    player1   INTEGER NOT NULL REFERENCES players(id),
+    winner    INTEGER NOT NULL REFERENCES players(id)
+);
+CREATE TABLE IF NOT EXISTS throws (
+    match_id INTEGER NOT NULL REFERENCES matches(id),
+    seq      INTEGER NOT NULL,
+    player   INTEGER NOT NULL,
+    angle    INTEGER NOT NULL,
+    speed    INTEGER NOT NULL,
+    PRIMARY KEY (match_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS players_by_rating ON players(rating DESC);
+CREATE INDEX IF NOT EXISTS matches_by_players ON matches(player0, player1);
+CREATE INDEX IF NOT EXISTS matches_by_players_reversed ON matches(player1, player0);
+"""
+
+
+class MatchResult:
+    """The result of one match.
+
+    names = names of player 0 and player 1
+    winner = index (0 or 1) of the winner
+    throws = list of (player_index, angle, speed), as in GameRecord.throws
+    """
+    __slots__ = ("names", "winner", "throws", "played_at")
+
+    def __init__(self, names, winner, throws=(), played_at=None):
+        self.names = tuple(names)
+        self.winner = winner
+        self.throws = throws
+        self.played_at = played_at if played_at is not None else time.time()
+
+
+def expected_score(rating, other_rating) -> float:
+    """Expected score of a player against another player, using Elo."""
+    return 1/(1 + 10**((other_rating - rating)/400))
+
+
+class ResultsStore:
+    """Players, matches, and ratings saved in a SQLite database."""
+
+    def __init__(self, filename):
+        # transactions are started explicitly, see record_matches
+        self.connection = sqlite3.connect(filename, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def _player(self, name):
+        """Return [id, rating] of a player, adding the player if new.
+        Call this in a transaction, since the rating may be changed
+        by other stores using the same database.
+        """
+        row = self.connection.execute(
+                "SELECT id, rating FROM players WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            cursor = self.connection.execute(
+                    "INSERT INTO players (name, rating) VALUES (?, ?)",
+                    (name, INITIAL_RATING))
+            row = (cursor.lastrowid, INITIAL_RATING)
+        return list(row)
+
+    def record_match(self, match: MatchResult):
+        self.record_matches([match])
+
+    def record_matches(self, matches):
+        """Save matches and update ratings, all in one transaction.
+
+        The transaction takes the write lock before reading the ratings,
+        so several stores (such as processes of a simulation) can write
+        to one database without losing rating updates.
+        """
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            throws_rows = []
+            # [id, rating] of players in this batch, by name
+            players_by_name = {}
+            # matches, wins, and new rating of each player in this batch
+            changed = {}
+            for match in matches:
+                for name in match.names:
+                    if name not in players_by_name:
+                        players_by_name[name] = self._player(name)
+                players = [players_by_name[name] for name in match.names]
+                (player0, player1) = players
+                winner = players[match.winner]
+                match_id = connection.execute(
+                        "INSERT INTO matches (played_at, player0, player1, winner) "
+                        "VALUES (?, ?, ?, ?)",
+                        (match.played_at, player0[0], player1[0], winner[0])).lastrowid
+                for seq, (player_index, angle, speed) in enumerate(match.throws):
+                    throws_rows.append((match_id, seq, player_index, angle, speed))
+                # Elo rating update
+                expected = expected_score(player0[1], player1[1])
+                actual = 1.0 if match.winner == 0 else 0.0
+                change = ELO_K*(actual - expected)
+                player0[1] += change
+                player1[1] -= change
+                for player in players:
+                    stats = changed.setdefault(player[0], [player, 0, 0])
+                    stats[1] += 1
+                    stats[2] += player is winner
+            connection.executemany(
+                    "INSERT INTO throws (match_id, seq, player, angle, speed) "
+                    "VALUES (?, ?, ?, ?, ?)", throws_rows)
+            connection.executemany(
+                    "UPDATE players SET rating = ?, matches = matches + ?, wins = wins + ? "
+                    "WHERE id = ?",
+                    [(player[1], count, wins, player_id)
+                     for player_id, (player, count, wins) in changed.items()])
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def leaderboard(self, limit=10):
+        """Return a list of (name, rating, matches, wins) of the
+        highest rated players.
+        """
+        return self.connection.execute(
+                "SELECT name, rating, matches, wins FROM players "
+                "ORDER BY rating DESC LIMIT ?", (limit,)).fetchall()
+
+    def head_to_head(self, name, other_name):
+        """Return (wins, losses) of a player in matches against another player."""
+        players = dict(self.connection.execute(
+                "SELECT name, id FROM players WHERE name IN (?, ?)", (name, other_name)))
+        if name not in players or other_name not in players:
+            return (0, 0)
+        player = players[name]
+        other = players[other_name]
+        (wins, total) = self.connection.execute(
+                "SELECT sum(winner = :player), count(*) FROM ("
+                " SELECT winner FROM matches WHERE player0 = :player AND player1 = :other"
+                " UNION ALL"
+                " SELECT winner FROM matches WHERE player0 = :other AND player1 = :player)",
+                {"player": player, "other": other}).fetchone()
+        wins = wins or 0
+        return (wins, total - wins)
+
+    def throws(self, match_id):
+        """Return the (player_index, angle, speed) of each throw in a match."""
+        return self.connection.execute(
+                "SELECT player, angle, speed FROM throws WHERE match_id = ? ORDER BY seq",
+                (match_id,)).fetchall()
+
+
+class ResultsWriter:
+    """Record matches in a ResultsStore using a background thread.
+
+    submit() puts a match in a queue and returns immediately.
+    The thread writes queued matches in batches.
+    """
+    enabled = True
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._queue = queue.Queue()
+        self._closed = False
+        # number of matches that couldn't be recorded, or None
+        # if the database couldn't be opened
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="results", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, match: MatchResult):
+        """Queue a match to be recorded."""
+        if self.failed is not None:
+            self._queue.put(match)
+
+    def close(self):
+        """Write all queued matches and stop the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        # sqlite connections can only be used by the thread that created them
+        try:
+            store = ResultsStore(self.filename)
+        except Exception:
+            logger.exception("can't open results database %s", self.filename)
+            self.failed = None
+            return
+        try:
+            running = True
+            while running:
+                batch = [self._queue.get()]
+                while len(batch) < BATCH_SIZE and not self._queue.empty():
+                    batch.append(self._queue.get())
+                if None in batch:
+                    running = False
+                    batch = [match for match in batch if match is not None]
+                if not batch:
+                    continue
+                try:
+                    store.record_matches(batch)
+                except Exception:
+                    # the batch is lost, but later matches may be recorded
+                    self.failed += len(batch)
+                    logger.exception("can't record %d matches in %s",
+                                     len(batch), self.filename)
+        finally:
+            store.close()
+
+
+class NullResultsWriter:
+    """A ResultsWriter that doesn't record anything."""
+    enabled = False
+
+    def submit(self, match):
+        pass
+
+    def close(self):
+        pass
+
+
+def open_results(filename):
+    """Return a ResultsWriter for filename, or a NullResultsWriter
+    if filename is None.
+    """
+    return ResultsWriter(filename) if filename else NullResultsWriter()
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python3 results.py database_file")
+        sys.exit(1)
+    store = ResultsStore(sys.argv[1])
+    for (name, rating, matches, wins) in store.leaderboard():
+        print(f"{name:20s} {rating:7.1f} {wins:6d} of {matches:6d}")
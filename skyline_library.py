@@ -0,0 +1,161 @@
+"""
+A library of pre-generated skylines and player positions, stored in a
+binary file of fixed-size records that is memory-mapped for reading.
+
+Any layout can be read by its index without reading or parsing the rest
+of the file, so a library can hold many thousands of layouts.  Layouts
+are checked for fairness (see fairness.py) when they are added, and new
+layouts can be appended to an existing library.
+
+File format (little-endian):
+    header: magic "GSKY", version, max buildings per layout,
+            record size, canvas width, canvas height
+    records: one per layout, see RECORD_HEAD and BUILDING below
+
+To create a library of 10,000 layouts, or add layouts to a library:
+
+    python3 skyline_library.py build skylines.bin 10000
+"""
+import mmap
+import os
+import random
+import struct
+from building import Building, BuildingFactory, BLDG_COLORS
+from state import Skyline
+import fairness
+import game_constants as config
+
+MAGIC = b"GSKY"
+VERSION = 1
+# Maximum number of buildings in a layout. Each building is at least
+# MIN_ROOMS*ROOM_WIDTH wide, so this is enough for a canvas 1280 pixels wide.
+MAX_BUILDINGS = 16
+HEADER = struct.Struct("<4sHHIHH")
+# number of buildings, index of buildings players stand on, fairness,
+# seed for choosing lit windows
+RECORD_HEAD = struct.Struct("<BBBxfI")
+# x, width, height, and color index of a building
+BUILDING = struct.Struct("<HHHBx")
+RECORD_SIZE = RECORD_HEAD.size + MAX_BUILDINGS*BUILDING.size
+
+
+class SkylineLibrary:
+    """A read-only, memory-mapped library of layouts.
+
+    Each layout is a Skyline and the indices of the buildings
+    that player 0 and player 1 stand on.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, max_buildings, record_size, self.width, self.height) = \
+                HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE \
+                or max_buildings != MAX_BUILDINGS:
+            self.close()
+            raise ValueError(f"{filename} is not a skyline library")
+        self._count = (len(self._map) - HEADER.size)//RECORD_SIZE
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def layout(self, index):
+        """Return (skyline, player_buildings, fairness) of a layout."""
+        if not 0 <= index < self._count:
+            raise IndexError("skyline library index out of range")
+        offset = HEADER.size + index*RECORD_SIZE
+        (count, left, right, score, seed) = RECORD_HEAD.unpack_from(self._map, offset)
+        offset += RECORD_HEAD.size
+        buildings = [BUILDING.unpack_from(self._map, offset + k*BUILDING.size)
+                     for k in range(count)]
+        # lit windows are chosen using the seed, so they are the same every time
+        rng = random.Random(seed)
+        lights = [Building.random_lights(width, height, rng)
+                  for (_, width, height, _) in buildings]
+        return (Skyline(self.height, buildings, lights), (left, right), score)
+
+    def random_layout(self):
+        """Return the skyline and player_buildings of a randomly chosen layout."""
+        (skyline, player_buildings, _) = self.layout(random.randrange(self._count))
+        return (skyline, player_buildings)
+
+
+def append_layouts(filename, layouts, width=config.CANVAS_WIDTH,
+                   height=config.CANVAS_HEIGHT):
+    """Append layouts to a library file, creating the file if needed.
+
+    layouts is an iterable of (layout, player_buildings, fairness), where
+    layout is a list of (x, width, height, color) as returned by
+    BuildingFactory.random_layout.
+    Returns the number of layouts appended.
+    """
+    exists = os.path.exists(filename) and os.path.getsize(filename) > 0
+    if exists:
+        with SkylineLibrary(filename) as library:
+            if (library.width, library.height) != (width, height):
+                raise ValueError(f"{filename} has layouts for a different canvas size")
+    count = 0
+    with open(filename, "ab") as file:
+        if not exists:
+            file.write(HEADER.pack(MAGIC, VERSION, MAX_BUILDINGS, RECORD_SIZE, width, height))
+        for (layout, (left, right), score) in layouts:
+            if len(layout) > MAX_BUILDINGS:
+                raise ValueError(f"layout has more than {MAX_BUILDINGS} buildings")
+            record = bytearray(RECORD_SIZE)
+            RECORD_HEAD.pack_into(record, 0, len(layout), left, right, score,
+                                  random.getrandbits(32))
+            for k, (x, bldg_width, bldg_height, color) in enumerate(layout):
+                BUILDING.pack_into(record, RECORD_HEAD.size + k*BUILDING.size,
+                                   x, bldg_width, bldg_height, BLDG_COLORS.index(color))
+            file.write(record)
+            count += 1
+    return count
+
+
+def generate_layouts(count, width=config.CANVAS_WIDTH, height=config.CANVAS_HEIGHT,
+                     threshold=config.FAIRNESS_THRESHOLD):
+    """Generate count random layouts having fairness of at least threshold."""
+    generated = 0
+    while generated < count:
+        layout = BuildingFactory.random_layout(width, height)
+        player_buildings = BuildingFactory.choose_player_buildings(len(layout))
+        score = fairness.layout_fairness(Skyline.from_layout(height, layout),
+                                         player_buildings, width, height)
+        if score >= threshold:
+            generated += 1
+            yield (layout, player_buildings, score)
+
+
+def open_library(filename, width=config.CANVAS_WIDTH, height=config.CANVAS_HEIGHT):
+    """Return the SkylineLibrary in filename, or None if filename is None,
+    the file doesn't exist, or its layouts are for a different canvas size.
+    """
+    if not filename or not os.path.exists(filename):
+        return None
+    library = SkylineLibrary(filename)
+    if (library.width, library.height) != (width, height) or len(library) == 0:
+        library.close()
+        return None
+    return library
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("Usage: python3 skyline_library.py build library_file count")
+        sys.exit(1)
+    added = append_layouts(sys.argv[2], generate_layouts(int(sys.argv[3])))
+    with SkylineLibrary(sys.argv[2]) as library:
+        print(f"Added {added} layouts. {sys.argv[2]} has {len(library)} layouts.")
@@ -0,0 +1,473 @@
+"""
+Compact game state for simulating many games without a canvas.
+
+The classes in this file hold only the numbers needed to play a game.
+They use __slots__ (or arrays, for the skyline and craters) instead of
+a __dict__, and have no references to images or Tk objects, so a single
+process can hold tens of thousands of simulated games.
+The canvas elements (Banana, Building, Explosion, Monkey) draw a game;
+these classes only play it.
+
+The motion and collision tests are the same as in Banana, Monkey,
+Explosion and GorillaGame.  Run this file to measure the memory per game:
+
+    python3 state.py [number_of_games]
+"""
+import math
+from array import array
+from PIL import Image
+from explosion import Explosion
+from building import BuildingFactory, BLDG_COLORS
+from banana import Banana
+from monkey import Monkey
+import game_constants as config
+
+# Image sizes are needed for collision tests.  Opening an image only
+# reads the header, not the image data.
+(BANANA_WIDTH, BANANA_HEIGHT) = Image.open("images/banana.png").size
+(MONKEY_WIDTH, MONKEY_HEIGHT) = Image.open("images/monkey.png").size
+# Collision masks of each image of a banana, and of a monkey for each
+# direction of throw (x_axis), shared with Banana and Monkey
+BANANA_MASKS = Banana.image_masks("images/banana.png")
+MONKEY_MASKS = {x_axis: Monkey.image_masks("images/monkey.png", x_axis)
+                for x_axis in (1, -1)}
+# number of images in animation of a spinning banana and a throwing monkey
+BANANA_FRAMES = 8
+MONKEY_FRAMES = 3
+
+# Phases of a game, same as the animation states of GorillaGame
+IDLE = 0
+THROWING = 1
+EXPLODING = 2
+
+
+class BananaState:
+    """Position and velocity of a banana, and the speed and angle
+    it remembers for the next throw.
+    """
+    __slots__ = ("x", "y", "vx", "vy", "start_x", "start_y",
+                 "speed", "angle", "x_axis", "is_moving", "image_index")
+
+    def __init__(self, x, y, x_axis=1):
+        self.x = self.start_x = x
+        self.y = self.start_y = y
+        self.vx = 0.0
+        self.vy = 0.0
+        self.speed = 20
+        self.angle = 45
+        self.x_axis = x_axis
+        self.is_moving = False
+        self.image_index = 0
+
+    def start(self):
+        """Throw the banana from its start position. Same as Banana.start."""
+        self.x = self.start_x
+        self.y = self.start_y
+        angle = math.radians(self.angle)
+        self.vx = math.cos(angle)*self.speed*self.x_axis
+        self.vy = math.sin(angle)*self.speed
+        self.is_moving = True
+        self.image_index = 0
+
+    def update(self, width, height):
+        """Move one time step. Same as Banana.update."""
+        self.x += self.vx
+        self.y -= self.vy
+        self.vy -= config.GRAVITY
+        self.image_index = (self.image_index - self.x_axis) % BANANA_FRAMES
+        if self.y > height or not (0 <= self.x <= width):
+            self.is_moving = False
+
+    def copy(self):
+        banana = BananaState.__new__(BananaState)
+        for name in BananaState.__slots__:
+            setattr(banana, name, getattr(self, name))
+        return banana
+
+    def mask_origin(self):
+        """Top left corner of the banana's image, same as Banana.mask_origin."""
+        return (math.floor(self.x) - BANANA_WIDTH//2, math.floor(self.y) - BANANA_HEIGHT//2)
+
+    def hit_points(self):
+        """Points tested for collision with buildings, same as Banana.hits."""
+        x = self.x
+        y = self.y
+        r = min(BANANA_WIDTH, BANANA_HEIGHT)
+        return ((x, y), (x+r, y), (x-r, y), (x, y-r), (x, y+r))
+
+
+class MonkeyState:
+    """A gorilla standing at (x,y), where y is the bottom of its image."""
+    __slots__ = ("x", "y", "image_index", "is_throwing", "banana")
+
+    def __init__(self, x, y, x_axis=1):
+        self.x = x
+        self.y = y
+        self.image_index = 0
+        self.is_throwing = False
+        # The banana starts 10 pixels above the monkey's head, as in Monkey
+        self.banana = BananaState(x, y - MONKEY_HEIGHT - 10, x_axis)
+
+    def copy(self):
+        monkey = MonkeyState.__new__(MonkeyState)
+        monkey.x = self.x
+        monkey.y = self.y
+        monkey.image_index = self.image_index
+        monkey.is_throwing = self.is_throwing
+        monkey.banana = self.banana.copy()
+        return monkey
+
+    def move_to(self, x, y):
+        self.banana.start_x += x - self.x
+        self.banana.start_y += y - self.y
+        self.x = x
+        self.y = y
+
+    def update(self):
+        """Advance the throwing animation. Same as Monkey.update."""
+        if self.is_throwing:
+            self.image_index = (self.image_index + 1) % MONKEY_FRAMES
+            self.is_throwing = self.image_index != 0
+        else:
+            self.image_index = 0
+
+    @property
+    def mask(self):
+        """Collision mask of the current image. A monkey faces the
+        direction it throws its banana.
+        """
+        return MONKEY_MASKS[self.banana.x_axis][self.image_index]
+
+    def mask_origin(self):
+        """Top left corner of the monkey's image, same as Monkey.mask_origin."""
+        return (math.floor(self.x) - MONKEY_WIDTH//2, math.floor(self.y) - MONKEY_HEIGHT)
+
+    def contains(self, x, y):
+        """Same test as Monkey.contains, using the collision mask."""
+        (left, top) = self.mask_origin()
+        return self.mask.contains(math.floor(x) - left, math.floor(y) - top)
+
+    def hit_by(self, banana) -> bool:
+        """Test if a banana touches the monkey, same as Banana.hits."""
+        (left, top) = self.mask_origin()
+        (x, y) = banana.mask_origin()
+        return self.mask.overlaps(BANANA_MASKS[banana.image_index], x - left, y - top)
+
+
+class ExplosionState:
+    """An explosion at (x,y). target is the index of the gorilla
+    that was hit, or -1 for a building.
+    """
+    __slots__ = ("x", "y", "step", "target")
+
+    def __init__(self, x, y, target):
+        self.x = x
+        self.y = y
+        self.step = 0
+        self.target = target
+
+    def copy(self):
+        explosion = ExplosionState(self.x, self.y, self.target)
+        explosion.step = self.step
+        return explosion
+
+    def update(self):
+        self.step += 1
+
+    def is_exploding(self):
+        return self.step < 2*Explosion.STEPS
+
+
+class Skyline:
+    """The buildings of a game, stored in arrays.
+
+    Building k has left edge xs[k], width widths[k], height heights[k]
+    and color BLDG_COLORS[colors[k]].  The baseline of every building
+    is the bottom of the canvas.  Windows don't affect play, but
+    lights[k] (if present) is a bit mask of the lit windows in building k,
+    so the skyline can be drawn the same way again.
+
+    A skyline is not changed during a game, so copies of a GameState
+    share the same Skyline.
+    """
+    __slots__ = ("baseline", "xs", "widths", "heights", "colors", "lights")
+
+    def __init__(self, baseline, buildings=(), lights=()):
+        """buildings is a sequence of (x, width, height, color_index)."""
+        self.baseline = baseline
+        self.lights = tuple(lights)
+        self.xs = array("H")
+        self.widths = array("H")
+        self.heights = array("H")
+        self.colors = bytearray()
+        for (x, width, height, color) in buildings:
+            self.xs.append(x)
+            self.widths.append(width)
+            self.heights.append(height)
+            self.colors.append(color)
+
+    @classmethod
+    def random(cls, width, height):
+        """Create a random skyline, same as BuildingFactory.create_buildings."""
+        return cls.from_layout(height, BuildingFactory.random_layout(width, height))
+
+    @classmethod
+    def from_layout(cls, baseline, layout):
+        """Create a skyline from a list of (x, width, height, color) of
+        buildings, as returned by BuildingFactory.random_layout.
+        """
+        return cls(baseline, [(x, width, height, BLDG_COLORS.index(color))
+                              for (x, width, height, color) in layout])
+
+    @classmethod
+    def from_buildings(cls, buildings):
+        """Create a skyline from a list of Building objects."""
+        baseline = buildings[0].y if buildings else config.CANVAS_HEIGHT
+        return cls(baseline,
+                   [(b.x, b.width, b.height, BLDG_COLORS.index(b.color)) for b in buildings],
+                   [b.light_mask() for b in buildings])
+
+    def __len__(self):
+        return len(self.xs)
+
+    def buildings(self):
+        """Return a list of (x, width, height, color_index) of each building."""
+        return list(zip(self.xs, self.widths, self.heights, self.colors))
+
+    def top(self, k):
+        """y coordinate of the top of building k."""
+        return self.baseline - self.heights[k]
+
+    def contains(self, x, y):
+        """Test if (x,y) is inside any building. Same as Building.contains."""
+        if not (self.baseline - max(self.heights) < y < self.baseline):
+            return False
+        for k in range(len(self.xs)):
+            left = self.xs[k]
+            if left < x < left + self.widths[k]:
+                return self.baseline - self.heights[k] < y
+        return False
+
+
+class GameState:
+    """The complete state of a game, without a canvas.
+
+    craters is a flat array of (x, y, radius) for each crater.
+    """
+    __slots__ = ("width", "height", "skyline", "players", "craters",
+                 "scores", "player_index", "phase", "explosion")
+
+    def __init__(self, skyline: Skyline, width=config.CANVAS_WIDTH,
+                 height=config.CANVAS_HEIGHT):
+        self.width = width
+        self.height = height
+        self.skyline = skyline
+        self.players = (MonkeyState(0, height, 1), MonkeyState(0, height, -1))
+        self.craters = array("f")
+        self.scores = [0, 0]
+        self.player_index = 0
+        self.phase = IDLE
+        self.explosion = None
+
+    @classmethod
+    def random(cls, width=config.CANVAS_WIDTH, height=config.CANVAS_HEIGHT,
+               fairness_threshold=0):
+        """A game with a random skyline and players placed as in
+        GorillaGame.add_players_to_game.  If fairness_threshold > 0,
+        the layout is chosen as in BuildingFactory.create_layout,
+        without a time limit.
+        """
+        (layout, player_buildings) = BuildingFactory.create_layout(
+                                        width, height, fairness_threshold, time_limit=None)
+        game = cls(Skyline.from_layout(height, layout), width, height)
+        for k in (0, 1):
+            game.place_player(k, player_buildings[k])
+        return game
+
+    def place_player(self, player_index, bldg_number):
+        """Put a player on top of the center of a building."""
+        skyline = self.skyline
+        x = skyline.xs[bldg_number] + skyline.widths[bldg_number]//2
+        self.players[player_index].move_to(x, skyline.top(bldg_number))
+
+    @property
+    def player(self):
+        return self.players[self.player_index]
+
+    def throw(self, angle=None, speed=None):
+        """Current player throws a banana, using the remembered speed
+        and angle unless others are given.
+        """
+        banana = self.player.banana
+        if angle is not None:
+            banana.angle = angle
+        if speed is not None:
+            banana.speed = speed
+        banana.start()
+        self.player.is_throwing = True
+        self.phase = THROWING
+
+    def in_crater(self, x, y):
+        craters = self.craters
+        for k in range(0, len(craters), 3):
+            if math.hypot(x - craters[k], y - craters[k+1]) <= craters[k+2]:
+                return True
+        return False
+
+    def clone(self):
+        """Return a copy of this state that can be changed independently.
+        The skyline is shared, other parts of the state are copied.
+        """
+        game = GameState.__new__(GameState)
+        game.width = self.width
+        game.height = self.height
+        game.skyline = self.skyline
+        game.players = (self.players[0].copy(), self.players[1].copy())
+        game.craters = array("f", self.craters)
+        game.scores = list(self.scores)
+        game.player_index = self.player_index
+        game.phase = self.phase
+        game.explosion = self.explosion.copy() if self.explosion else None
+        return game
+
+    def new_game(self):
+        """Return a copy of this state at the start of a new game on the
+        same skyline, with the same players, scores, and remembered speed
+        and angle of each banana.
+        """
+        game = self.clone()
+        game.craters = array("f")
+        game.phase = IDLE
+        game.explosion = None
+        for player in game.players:
+            player.image_index = 0
+            player.is_throwing = False
+            banana = player.banana
+            banana.x = banana.start_x
+            banana.y = banana.start_y
+            banana.vx = banana.vy = 0.0
+            banana.is_moving = False
+        return game
+
+    def to_dict(self) -> dict:
+        """Return the state as a dict that can be saved as JSON."""
+        def slots(obj, names):
+            return {name: getattr(obj, name) for name in names}
+        skyline = self.skyline
+        players = []
+        for player in self.players:
+            player_dict = slots(player, ("x", "y", "image_index", "is_throwing"))
+            player_dict["banana"] = slots(player.banana, BananaState.__slots__)
+            players.append(player_dict)
+        explosion = self.explosion
+        return {"width": self.width,
+                "height": self.height,
+                "skyline": {"baseline": skyline.baseline,
+                            "buildings": skyline.buildings(),
+                            "lights": list(skyline.lights)},
+                "players": players,
+                "craters": list(self.craters),
+                "scores": list(self.scores),
+                "player_index": self.player_index,
+                "phase": self.phase,
+                "explosion": slots(explosion, ExplosionState.__slots__) if explosion else None
+                }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Create a GameState from a dict created by to_dict."""
+        skyline = Skyline(data["skyline"]["baseline"], data["skyline"]["buildings"],
+                          data["skyline"]["lights"])
+        game = cls(skyline, data["width"], data["height"])
+        for player, player_dict in zip(game.players, data["players"]):
+            for name, value in player_dict.items():
+                if name == "banana":
+                    for banana_name, banana_value in value.items():
+                        setattr(player.banana, banana_name, banana_value)
+                else:
+                    setattr(player, name, value)
+        game.craters = array("f", data["craters"])
+        game.scores = list(data["scores"])
+        game.player_index = data["player_index"]
+        game.phase = data["phase"]
+        if data["explosion"]:
+            explosion = data["explosion"]
+            game.explosion = ExplosionState(explosion["x"], explosion["y"], explosion["target"])
+            game.explosion.step = explosion["step"]
+        return game
+
+    def step(self):
+        """Advance the game one animation frame.
+
+        Returns the index of the winner when a game ends, otherwise None.
+        """
+        if self.phase == THROWING:
+            self._step_throwing()
+        elif self.phase == EXPLODING:
+            return self._step_exploding()
+        return None
+
+    def _step_throwing(self):
+        banana = self.player.banana
+        banana.update(self.width, self.height)
+        self.player.update()
+        if not banana.is_moving:
+            self.next_player()
+            return
+        for k, player in enumerate(self.players):
+            if player.hit_by(banana):
+                self._explode(k)
+                return
+        points = banana.hit_points()
+        if not self.in_crater(banana.x, banana.y) and \
+                any(self.skyline.contains(x, y) for (x, y) in points):
+            self._explode(-1)
+
+    def _explode(self, target):
+        banana = self.player.banana
+        banana.is_moving = False
+        self.explosion = ExplosionState(banana.x, banana.y, target)
+        self.phase = EXPLODING
+
+    def _step_exploding(self):
+        explosion = self.explosion
+        explosion.update()
+        self.player.update()
+        if explosion.is_exploding():
+            return None
+        self.craters.extend((explosion.x, explosion.y, Explosion.crater_radius()))
+        self.explosion = None
+        if explosion.target >= 0:
+            winner = 1 - explosion.target
+            self.scores[winner] += 1
+            self.phase = IDLE
+            return winner
+        self.next_player()
+        return None
+
+    def next_player(self):
+        self.player_index = 1 - self.player_index
+        self.phase = IDLE
+
+
+def measure_game_memory(count=10000) -> float:
+    """Create count random games and return the average memory
+    per game, in bytes, measured by tracemalloc.
+    """
+    import tracemalloc
+    # create one game first, so modules imported when creating a game
+    # are not counted
+    GameState.random()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = [GameState.random() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before)/count
+
+
+if __name__ == "__main__":
+    import sys
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"{measure_game_memory(count):.0f} bytes per game")
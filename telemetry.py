@@ -0,0 +1,176 @@
+"""
+A structured stream of game events, written to a file in the background.
+
+Events are appended to an in-memory ring buffer by emit(), which never
+blocks.  A writer thread removes events from the buffer in batches and
+writes them to a JSON Lines file or a compact binary file.
+If the writer falls behind and the buffer is full, the oldest events
+are dropped and counted in Telemetry.dropped.
+
+Each event type has a fixed list of fields (see EVENTS), which are
+passed to emit() as positional arguments in that order:
+
+    telemetry.emit("throw", player_index, angle, speed)
+"""
+import atexit
+import json
+import struct
+import threading
+import time
+from collections import deque
+
+# Event name -> (type code, struct format of fields, field names)
+EVENTS = {
+    "throw":     (1, "<Bhh", ("player", "angle", "speed")),
+    "banana":    (2, "<ff", ("x", "y")),
+    # target is the index of the gorilla that was hit, or -1 for a building
+    "impact":    (3, "<ffb", ("x", "y", "target")),
+    "explosion": (4, "<ffB", ("x", "y", "step")),
+    "turn":      (5, "<B", ("player",)),
+    "game_over": (6, "<BHH", ("winner", "score0", "score1")),
+}
+EVENTS_BY_CODE = {code: (name, struct.Struct(fmt), fields)
+                  for name, (code, fmt, fields) in EVENTS.items()}
+# Each binary record starts with the time of the event and its type code
+RECORD_HEADER = struct.Struct("<dB")
+BINARY_MAGIC = b"GTEL1\n"
+
+# Default size of the ring buffer, in events
+CAPACITY = 16384
+# Maximum number of events written in one batch
+BATCH_SIZE = 2048
+# Seconds between writes when the buffer is not filling up
+FLUSH_INTERVAL = 0.5
+
+
+class NullTelemetry:
+    """Telemetry that discards all events. Used when telemetry is disabled."""
+    dropped = 0
+
+    def emit(self, event, *fields):
+        pass
+
+    def close(self):
+        pass
+
+
+class Telemetry:
+    """Write game events to a file using a background thread.
+
+    Arguments:
+        filename - the file to write
+        binary - if True, write compact binary records instead of JSON Lines
+        capacity - maximum number of events waiting to be written
+    """
+
+    def __init__(self, filename, binary=False, capacity=CAPACITY):
+        self.filename = filename
+        self.binary = binary
+        self.capacity = capacity
+        self.dropped = 0
+        self.written = 0
+        # wake the writer when this many events are waiting
+        self._batch_threshold = max(1, min(BATCH_SIZE, capacity//2))
+        # deque.append and deque.popleft are thread-safe, and
+        # a deque with maxlen discards the oldest item when full.
+        self._buffer = deque(maxlen=capacity)
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._file = open(filename, "wb" if binary else "w")
+        if binary:
+            self._file.write(BINARY_MAGIC)
+        self._writer = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def emit(self, event, *fields):
+        """Add an event to the buffer. This never blocks.
+
+        If the buffer is full the oldest event is dropped.
+        """
+        if self._closed:
+            return
+        buffer = self._buffer
+        if len(buffer) >= self.capacity:
+            self.dropped += 1
+        buffer.append((time.time(), event, fields))
+        if len(buffer) >= self._batch_threshold:
+            self._wakeup.set()
+
+    def close(self):
+        """Write any remaining events and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join()
+        self._file.close()
+
+    def _run(self):
+        """Write batches of events until closed."""
+        while not self._closed:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self._write_pending()
+        # the buffer may have events added before close() was called
+        self._write_pending()
+
+    def _write_pending(self):
+        buffer = self._buffer
+        while buffer:
+            batch = []
+            while buffer and len(batch) < BATCH_SIZE:
+                batch.append(buffer.popleft())
+            encode = self._encode_binary if self.binary else self._encode_json
+            self._file.write(encode(batch))
+            self.written += len(batch)
+        self._file.flush()
+
+    @staticmethod
+    def _encode_json(batch) -> str:
+        lines = []
+        for (timestamp, event, fields) in batch:
+            record = {"time": timestamp, "event": event}
+            record.update(zip(EVENTS[event][2], fields))
+            lines.append(json.dumps(record))
+        lines.append("")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _encode_binary(batch) -> bytes:
+        parts = []
+        for (timestamp, event, fields) in batch:
+            (code, fmt, _) = EVENTS[event]
+            parts.append(RECORD_HEADER.pack(timestamp, code))
+            parts.append(struct.pack(fmt, *fields))
+        return b"".join(parts)
+
+
+def read_binary(filename):
+    """Read events from a binary telemetry file.
+
+    Generates dicts of the same form as the JSON Lines records.
+    """
+    with open(filename, "rb") as file:
+        data = file.read()
+    if not data.startswith(BINARY_MAGIC):
+        raise ValueError(f"{filename} is not a telemetry file")
+    offset = len(BINARY_MAGIC)
+    while offset < len(data):
+        (timestamp, code) = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        (name, fmt, fields) = EVENTS_BY_CODE[code]
+        values = fmt.unpack_from(data, offset)
+        offset += fmt.size
+        record = {"time": timestamp, "event": name}
+        record.update(zip(fields, values))
+        yield record
+
+
+def open_telemetry(filename):
+    """Return a Telemetry that writes to filename, or a NullTelemetry
+    if filename is None.  Files ending in .bin use the binary format.
+    """
+    if not filename:
+        return NullTelemetry()
+    return Telemetry(filename, binary=filename.endswith(".bin"))